@@ -3,129 +3,370 @@
 ##### Uniqname: skenkre     #####
 #################################
 
-from bs4 import BeautifulSoup
-import requests
 import json
+import mimetypes
 import csv
-import pandas as pd
+import gzip
+import hashlib
+import os
+import pkgutil
+import re
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache, wraps
+from urllib.parse import parse_qsl, urlparse
+import numpy as np
 import sqlite3
-import plotly.express as px
-from flask import Flask, render_template, request
-import plotly.graph_objs as go
-
-CACHE_FILENAME = "imdb_cache.json"
-CACHE_DICT = {}
+from flask import (Blueprint, Flask, current_app, g, has_app_context, jsonify, redirect, render_template, request,
+                   send_from_directory, stream_with_context, url_for)
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import NotFound
+# bs4, requests and pyarrow are imported by the functions that use them, and the charts only
+# read plotly's package data, so serving the pages does not load the heavy libraries
+
+# brotli is optional: without it, assets and pages are only compressed with gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CACHE_FILENAME = "imdb_cache.sqlite"
+LEGACY_CACHE_FILENAME = "imdb_cache.json"
+
+# Eviction limits for the scrape cache; None disables the limit.
+CACHE_MAX_BYTES = None
+CACHE_MAX_AGE = None
+
+# Seconds a cached page stays fresh before refresh_crawl revalidates it, by page type
+CACHE_TTLS = {
+    'chart': 60 * 60,
+    'title': 7 * 24 * 60 * 60,
+    'name': 30 * 24 * 60 * 60,
+    'other': 24 * 60 * 60,
+}
 
 BASEURL = "https://www.imdb.com"
+CHART_URL = BASEURL + "/chart/top-english-movies"
+
+# HTML parser for IMDb pages. "lxml" is much faster than the built-in "html.parser"
+# but needs the lxml package; run verify_parser_backend("lxml") before switching.
+PARSER_BACKEND = 'html.parser'
+# Only build the parts of each page that the scrapers read
+PARTIAL_PARSING = True
+# Bump whenever a parse_*_html function changes what it returns, so results saved in
+# the extraction cache are scraped again
+EXTRACTOR_VERSION = 1
+
+DB_FILENAME = "movie.db"
+
+# Typed columns of the movie and director datasets in Parquet and Arrow files: {column: Arrow type}
+DATASET_COLUMNS = {
+    'movie': {
+        'title': 'string', 'releaseYear': 'int64', 'runtimeMins': 'int64', 'genre': 'string',
+        'director': 'string', 'worldwideGross': 'int64', 'grossUSA': 'int64', 'budget': 'int64',
+        'imdbRating': 'float64', 'listRank': 'int64', 'url': 'string',
+    },
+    'director': {
+        'name': 'string', 'birthYear': 'int64', 'birthCountry': 'string', 'trademark': 'string',
+        'directorCredits': 'int64', 'url': 'string',
+    },
+}
+
+# Number of scraped records written to the database per transaction
+DB_BATCH_SIZE = 50
+
+# Indexes of the movie database: {index name: table and columns}
+DB_INDEXES = {
+    # upserts match rows on their page url
+    'movieInfo_url': 'movieInfo (url)',
+    'director_url': 'director (url)',
+    # movies are linked to their director by name, ignoring case, since movie pages
+    # title-case names (e.g. "John Mctiernan" for "John McTiernan")
+    'director_name': 'director (name COLLATE NOCASE)',
+    # filters and sort orders of the web pages
+    'movieInfo_genre_rank': 'movieInfo (genre, listRank)',
+    'movieInfo_rank': 'movieInfo (listRank)',
+    'movieInfo_rating': 'movieInfo (imdbRating, budget, worldwideGross, listRank)',
+    'movieInfo_title': 'movieInfo (title)',
+    'director_country_credits': 'director (birthCountry, directorCredits)',
+    'director_credits': 'director (directorCredits)',
+}
+
+# Summary tables of the movie database: {summary table: (table, grouped column and its type, column for min/max)}.
+# Each summary row holds one value of the grouped column with its rowCount, minValue and maxValue.
+DB_SUMMARIES = {
+    'genreSummary': ('movieInfo', 'genre VARCHAR(255)', 'listRank'),
+    'ratingSummary': ('movieInfo', 'imdbRating REAL', 'listRank'),
+    'countrySummary': ('director', 'birthCountry VARCHAR(255)', 'directorCredits'),
+}
+
+# Full-text search indexes of the movie database: {search table: (table, searched column, year column)}.
+# They are FTS5 tables over the trigram tokenizer, so they answer substring and fuzzy queries.
+DB_SEARCH = {
+    'movieSearch': ('movieInfo', 'title', 'releaseYear'),
+    'directorSearch': ('director', 'name', 'birthYear'),
+}
+
+# Largest number of rows of the top movies and directors tables shown on one page
+PAGE_SIZE = 50
+
+# Sort keys standing for NULL in the page cursors: movies without a listRank come after all ranked
+# movies, and directors without directorCredits after all credited directors, each in id order
+NULL_RANK = 2 ** 63 - 1
+NULL_CREDITS = -1
+
+# Default and largest number of results of a typeahead search
+SEARCH_LIMIT = 10
+SEARCH_MAX_LIMIT = 50
+
+# Rows fetched from the cursor at a time, and bytes of HTML sent at a time, by streamed pages
+STREAM_CHUNK = 200
+STREAM_FLUSH_BYTES = 16 * 1024
+
+# Results of the data functions kept per dataset version, and limits of the JSON API
+DATASET_CACHE_SIZE = 256
+COMPARE_LIMIT = 20
+BATCH_LIMIT = 50
+
+# Bytes of the movie database that readers memory-map
+DB_MMAP_SIZE = 256 * 1024 * 1024
+
+# Idle read-only connections to the movie database kept for the next requests, per database
+DB_POOL_SIZE = 8
+
+# Version of the movie database schema, kept in PRAGMA user_version; see migrate_db
+DB_SCHEMA_VERSION = 4
+
+# Columns of the catalog snapshot: movies joined with their director, in rank order. Text columns
+# are kept as object arrays, category columns as integer codes (-1 if missing) into a sorted array
+# of their values, and the other columns as float arrays with NaN for missing values.
+SNAPSHOT_QUERY = '''
+    SELECT m.id, m.title, m.releaseYear, m.runtimeMins, m.genre, m.worldwideGross, m.grossUSA, m.budget,
+        m.imdbRating, m.listRank, m.url, d.name AS director, d.birthYear, d.birthCountry, d.directorCredits
+    FROM movieInfo m
+    LEFT JOIN director d
+    ON m.directorId = d.id
+    ORDER BY m.listRank
+'''
+SNAPSHOT_TEXT = ('title', 'url')
+SNAPSHOT_CATEGORIES = ('genre', 'director', 'birthCountry')
+
+# Crawl settings: number of pages fetched at once, polite request rate per host,
+# and how often a throttled (429/503) request is retried.
+CRAWL_CONCURRENCY = 8
+CRAWL_RATE = 10.0
+CRAWL_MAX_INTERVAL = 60.0
+CRAWL_MAX_RETRIES = 5
+
+# Each thread gets its own connection to the cache store and to the movie database
+_cache_local = threading.local()
+_db_local = threading.local()
+
+# Idle read-only connections of the web app: {database file name: [sqlite3.Connection]}
+_db_pool = {}
+_db_pool_lock = threading.Lock()
+
+# Cache stores already migrated by this process, by absolute path
+_cache_migrated = set()
+_cache_lock = threading.Lock()
+
+# Memoized parse of the top 250 list page
+_chart_memo = {}
+_chart_lock = threading.Lock()
+
+# One HTTP session (and connection pool) shared by all crawl threads
+_session = None
+_session_lock = threading.Lock()
+
+# PageStrainers made by get_strainer, by the tags they keep
+_strainers = {}
+
+# Per-host rate limit state: {host: {'interval': seconds, 'next': time}}
+_host_state = {}
+_host_lock = threading.Lock()
+
+# Fingerprinted static assets: build_assets writes them under static/ASSET_DIR, and they are
+# served from /assets/ with year-long cache headers
+ASSET_DIR = 'dist'
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+
+# Content types worth compressing, and the smallest response that is compressed
+COMPRESS_MIMETYPES = {'text/html', 'text/css', 'text/javascript', 'application/javascript', 'application/json',
+                      'image/svg+xml'}
+COMPRESS_MIN_BYTES = 1024
+
+# Colors of the chart traces: the box office colors of the site, then plotly's default sequence
+BOXOFFICE_COLORS = {'budget': '#1848f5', 'gross': '#F5C518'}
+CHART_COLORS = ['#636efa', '#EF553B', '#00cc96', '#ab63fa', '#FFA15A', '#19d3f3', '#FF6692', '#B6E880', '#FF97FF', '#FECB52']
+
+# Fingerprint of the web app's code and templates, part of every ETag
+_app_fingerprint = None
+
+# plotly.js bundle served to the chart pages, and its content hash: {'js': str, 'fingerprint': str}
+_plotly_js = {}
+
+# Manifest of the fingerprinted assets: {source path: fingerprinted path}
+_asset_manifest = None
+
+# plotly's default theme, applied to every chart
+_chart_template = None
+
+# Columnar snapshot of the movie database, reloaded when the database file changes
+_snapshot = None
+_snapshot_lock = threading.Lock()
 
 ##### SET UP CACHE #####
 
-def open_cache():
+def open_cache(filename=CACHE_FILENAME):
     '''
-    Opens the cache file if it exists and loads the JSON into
-    the CACHE_DICT dictionary.
-    if the cache file doesn't exist, creates a new cache dictionary
+    Opens the cache store if it exists, or creates a new one. The store is an SQLite
+    file with one row per cached page, so pages are read lazily by URL and each miss
+    writes a single row instead of rewriting the whole cache. Pages are stored compressed.
+    Next to the pages, the extraction table keeps the scraped values of each page keyed by
+    a hash of its HTML, so unchanged pages are never parsed twice.
+    If the store is empty and the old JSON cache file exists, its pages are imported.
 
     Parameters
     ----------
-    None
+    filename: string
+        Path to the cache store.
 
     Returns
     -------
-    The opened cache: dict
+    sqlite3.Connection
+        connection to the opened cache store
     '''
-    try:
-        cache_file = open(CACHE_FILENAME, 'r')
-        cache_contents = cache_file.read()
-        cache_dict = json.loads(cache_contents)
-        cache_file.close()
-    except:
-        cache_dict = {}
-    return cache_dict
+    conn = sqlite3.connect(filename, timeout=30)
+    # WAL lets readers and one writer work at the same time; the busy timeout makes
+    # concurrent writers wait for each other instead of failing.
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+
+    page_table = '''
+        CREATE TABLE IF NOT EXISTS page (
+            url TEXT PRIMARY KEY,
+            body BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            fetchedAt REAL NOT NULL,
+            etag TEXT,
+            lastModified TEXT,
+            contentHash TEXT
+        )
+    '''
+    extraction_table = '''
+        CREATE TABLE IF NOT EXISTS extraction (
+            contentHash TEXT NOT NULL,
+            extractor TEXT NOT NULL,
+            result TEXT NOT NULL,
+            PRIMARY KEY (contentHash, extractor)
+        )
+    '''
+    conn.execute(page_table)
+    conn.execute(extraction_table)
+    conn.commit()
 
-def save_cache(cache_dict):
+    # Migrate the store once per process, before any other thread's connection can use it
+    # or import the old JSON cache a second time
+    with _cache_lock:
+        path = os.path.abspath(filename)
+        if path not in _cache_migrated:
+            migrate_cache(conn)
+            _cache_migrated.add(path)
+    return conn
+
+def migrate_cache(conn):
     '''
-    Saves the current state of the cache to disk
+    Bring a cache store made by an older version up to date: add the missing columns and the
+    indexes, compress the pages stored as plain HTML, and import the old JSON cache file into an empty store.
+    open_cache runs this once per store and process.
 
     Parameters
     ----------
-    cache_dict: dict
-        The dictionary to save
+    conn: sqlite3.Connection
+        Connection to the cache store.
 
     Returns
     -------
     None
     '''
-    dumped_json_cache = json.dumps(cache_dict)
-    fw = open(CACHE_FILENAME,"w")
-    fw.write(dumped_json_cache)
-    fw.close()
+    # stores from older versions are missing these columns and hold uncompressed pages
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(page)')]
+    for column in ('etag', 'lastModified', 'contentHash'):
+        if column not in columns:
+            conn.execute(f'ALTER TABLE page ADD COLUMN {column} TEXT')
+    old_pages = conn.execute('SELECT url, body FROM page WHERE contentHash IS NULL').fetchall()
+    for url, body in old_pages:
+        compressed = compress_html(body)
+        conn.execute('''
+            UPDATE page SET body = ?, size = ?, contentHash = ? WHERE url = ?
+        ''', (compressed, len(compressed), hash_html(body), url))
+
+    conn.execute('CREATE INDEX IF NOT EXISTS page_fetchedAt ON page (fetchedAt)')
+    conn.execute('CREATE INDEX IF NOT EXISTS page_contentHash ON page (contentHash)')
+    conn.commit()
 
-def make_request_with_cache(baseurl, cache_dict):
+    empty = conn.execute('SELECT 1 FROM page LIMIT 1').fetchone() is None
+    if empty and os.path.exists(LEGACY_CACHE_FILENAME):
+        import_json_cache(LEGACY_CACHE_FILENAME, conn)
+
+def compress_html(html):
     '''
-    Check the cache for a saved result. If the result is found, return it. Otherwise send a new 
-    request, save it, then return it.
+    Compress the HTML of a page for the cache store.
 
     Parameters
     ----------
-    baseurl: string
-        The URL for the website.
-    cache_dict: dict
-        Dictionary with cache results.
+    html: string
+        HTML of the page.
 
     Returns
     -------
-    dict
-        the results of the query as a dictionary loaded from cache
-        JSON
+    bytes
+        the compressed HTML
     '''
-   
-    if baseurl in CACHE_DICT.keys():
-        print(f"Using cache")
-        return CACHE_DICT[baseurl]
-
-    else:
-        print(f"Making a request")
-        CACHE_DICT[baseurl] = requests.get(baseurl).text
-        save_cache(CACHE_DICT)
-        return CACHE_DICT[baseurl]
-
-##### CRAWL AND SCRAPE IMDb FOR MOVIE AND DIRECTOR INFORMATION #####
+    return zlib.compress(html.encode('utf-8'))
 
-def build_movie_url_dict():
-    ''' 
-    Make a dictionary that maps movie titles to movie title url from "https://www.imdb.com/chart/top-english-movies"
+def decompress_html(body):
+    '''
+    Turn a page body from the cache store back into HTML.
 
     Parameters
     ----------
-    None
+    body: bytes
+        The stored page body.
 
     Returns
     -------
-    dict
-        key is a title name and value is the url
-        e.g. {'the shawshank redemption':'https://www.imdb.com/title/tt0111161', ...}
+    string
+        the HTML of the page
     '''
+    if isinstance(body, str):
+        return body
+    return zlib.decompress(body).decode('utf-8')
 
-    movie_dict = {}
-    list_url = 'https://www.imdb.com/chart/top-english-movies'
-
-    html = make_request_with_cache(list_url, CACHE_DICT)
-    soup = BeautifulSoup(html, 'html.parser')
+def hash_html(html):
+    '''
+    Hash the HTML of a page to key its scraped values in the extraction cache.
 
-    search_div = soup.find('div', class_="lister")
-    links_list = search_div.find_all(class_="titleColumn")
-    for v in links_list:
-        value = v.find('a')
-        exten = value.get('href')
-        movie_name = value.text.lower().strip()
-        movie_dict[movie_name] = BASEURL+exten
+    Parameters
+    ----------
+    html: string
+        HTML of the page.
 
-    return movie_dict
+    Returns
+    -------
+    string
+        hex digest of the HTML
+    '''
+    return hashlib.sha1(html.encode('utf-8')).hexdigest()
 
-def get_rankings_dict():
+def get_cache_conn():
     '''
-    Make a dictionary that maps movie rank on top 250 list to movie title from "https://www.imdb.com/chart/top-english-movies"
+    Get the calling thread's connection to the cache store, opening it on first use.
 
     Parameters
     ----------
@@ -133,259 +374,494 @@ def get_rankings_dict():
 
     Returns
     -------
-    dict
-        key is a rank on list and value is the movie title
-        e.g. {1: 'The Shawshank Redemption', 2: 'The Godfather', ...}
+    sqlite3.Connection
+        connection to the cache store
     '''
-    list_url = 'https://www.imdb.com/chart/top-english-movies'
-
-    html = make_request_with_cache(list_url, CACHE_DICT)
-    soup = BeautifulSoup(html, 'html.parser')
+    conn = getattr(_cache_local, 'conn', None)
+    if conn is None:
+        conn = open_cache()
+        _cache_local.conn = conn
+    return conn
 
-    ranking_dict = {}
+def close_cache():
+    '''
+    Close the calling thread's connection to the cache store, if it has one. The next
+    cache call on this thread opens it again.
 
-    #Get list of <td> elements for ranks and titles
-    ranks = soup.find_all('td', class_='posterColumn')
-    titles = soup.find_all('td', class_='titleColumn')
+    Parameters
+    ----------
+    None
 
-    title_list = []
-    for name in titles:
-        title = name.find('a').text
-        title_list.append(title)
+    Returns
+    -------
+    None
+    '''
+    conn = getattr(_cache_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _cache_local.conn = None
 
-    rank_list = []
-    for num in ranks:
-        rank =  rank = num.find('span').get('data-value')
-        rank_list.append(rank)
-    
-    for i in range(len(rank_list)):
-        ranking_dict[rank_list[i]]=title_list[i]
+def import_json_cache(filename, conn=None):
+    '''
+    Import the pages from an old JSON cache file into the cache store. Pages that are
+    already in the store are kept.
 
-    return ranking_dict
+    Parameters
+    ----------
+    filename: string
+        Path to the JSON cache file.
+    conn: sqlite3.Connection
+        Connection to the cache store. Uses the thread's connection if None.
 
-def get_movie_info(movie_url):
-    ''' 
-    Get values from movie site urls. Information to gather: Title, Release Year, Runtime, Genre, 
-    Director, Worldwide Gross, Gross USA, Budget, IMDb Rating, Ranking in Top 250 list, movie site URL. 
+    Returns
+    -------
+    int
+        number of pages imported
+    '''
+    if conn is None:
+        conn = get_cache_conn()
+    with open(filename, 'r') as cache_file:
+        cache_dict = json.load(cache_file)
+
+    now = time.time()
+    imported = 0
+    with conn:
+        for url, html in cache_dict.items():
+            body = compress_html(html)
+            cur = conn.execute('''
+                INSERT OR IGNORE INTO page (url, body, size, fetchedAt, contentHash)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (url, body, len(body), now, hash_html(html)))
+            imported += cur.rowcount
+    return imported
+
+def cache_get(url):
+    '''
+    Look up a single page in the cache store.
 
     Parameters
     ----------
-    movie_url: string
-        URL for movie page on IMDb
+    url: string
+        The URL of the page.
 
     Returns
     -------
-    dictionary movie information
-        keys are labels and value is the scraped information from web page
-        e.g. {'Title':'The Shawshank Redemption', 'Release Year': 1994, ...}
+    string
+        the cached HTML, or None if the page is not cached
     '''
+    row = get_cache_conn().execute('SELECT body FROM page WHERE url = ?', (url,)).fetchone()
+    if row:
+        return decompress_html(row[0])
+    return None
 
-    response = make_request_with_cache(movie_url, CACHE_DICT)
-    soup = BeautifulSoup(response, 'html.parser')
+def cache_get_entry(url):
+    '''
+    Look up a single page in the cache store along with its fetch time and validators.
 
-    #Get rankings dictionary to access rankings for movies
-    try:
-        title = soup.find(class_='title_wrapper').find('h1', class_='').text[:-7].strip()
-    except:
-        title = soup.find(class_='title_wrapper').find('h1', class_='long').text[:-7].strip()
+    Parameters
+    ----------
+    url: string
+        The URL of the page.
 
-    #Use title (value in dict) to compare to rankings dictionary and pull correct rank (key)
-    ranks = get_rankings_dict()
-    for k, v in ranks.items():
-        if v.lower() == title.lower():
-            rank = k
+    Returns
+    -------
+    dict
+        keys are body, fetchedAt, etag, and lastModified, or None if the page is not cached
+    '''
+    row = get_cache_conn().execute('''
+        SELECT body, fetchedAt, etag, lastModified FROM page WHERE url = ?
+    ''', (url,)).fetchone()
+    if row:
+        return {'body': decompress_html(row[0]), 'fetchedAt': row[1], 'etag': row[2], 'lastModified': row[3]}
+    return None
+
+def cache_put(url, body, etag=None, last_modified=None):
+    '''
+    Save a single page to the cache store, replacing any older copy.
 
-    release = soup.find(class_='title_wrapper').find(id='titleYear').text[1:5]
-    genre = soup.find(class_='title_wrapper').find(class_="subtext").find('a').text
-    director = soup.find(class_='credit_summary_item').find('a').text.title().strip()
+    Parameters
+    ----------
+    url: string
+        The URL of the page.
+    body: string
+        The HTML of the page.
+    etag: string
+        ETag header the page was served with, if any.
+    last_modified: string
+        Last-Modified header the page was served with, if any.
 
-    # Get worldwide gross, runtime, budget, and gross USA from Box Office section
-    try:
-        usa_text ='Gross USA'
-        for all_txt in soup.find_all("div", class_="txt-block"):
-            find_usa = all_txt.get_text(strip=True).split(':')
-            if find_usa[0] == usa_text:
-                gross_usa = find_usa[1].split('(')[0][1:].replace(',','')
-        gross_usa
-    except:
-        gross_usa = "No info"
+    Returns
+    -------
+    None
+    '''
+    html = body
+    body = compress_html(html)
+    conn = get_cache_conn()
+    with conn:
+        conn.execute('''
+            INSERT OR REPLACE INTO page (url, body, size, fetchedAt, etag, lastModified, contentHash)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (url, body, len(body), time.time(), etag, last_modified, hash_html(html)))
+
+def cache_touch(url):
+    '''
+    Mark a cached page as fresh again after the server confirmed it has not changed.
 
-    try:
-        budget_text ='Budget'
-        for all_txt in soup.find_all("div", class_="txt-block"):
-            find_budget = all_txt.get_text(strip=True).split(':')
-            if find_budget[0] == budget_text:
-                if '$' not in find_budget[1]:
-                    budget = "No info"
-                else:
-                    budget = find_budget[1].split('(')[0][1:].replace(',','')
-        budget
-    except:
-        budget = "No info"
+    Parameters
+    ----------
+    url: string
+        The URL of the page.
 
-    try:
-        gross_text ='Cumulative Worldwide Gross'
-        for all_txt in soup.find_all("div", class_="txt-block"):
-            find_gross = all_txt.get_text(strip=True).split(':')
-            if find_gross[0] == gross_text:
-                worldwide_gross = find_gross[1].split('(')[0][1:].replace(',','')
-        worldwide_gross
-    except:
-        worldwide_gross = "No info"
+    Returns
+    -------
+    None
+    '''
+    conn = get_cache_conn()
+    with conn:
+        conn.execute('UPDATE page SET fetchedAt = ? WHERE url = ?', (time.time(), url))
 
-    try:
-        runtime_text ='Runtime'
-        for all_txt in soup.find_all("div", class_="txt-block"):
-            find_runtime = all_txt.get_text(strip=True).split(':')
-            if find_runtime[0] == runtime_text:
-                runtime = find_runtime[1].split(' ')[0]
-        runtime
-    except:
-        runtime = "No info"
+def iter_cache_pages():
+    '''
+    Iterate over every page in the cache store without loading them all into memory.
 
-    # Get IMDb Rating
-    rating = soup.find(itemprop='ratingValue').text
+    Parameters
+    ----------
+    None
 
-    # Create a dictionary with key, value pairs with the above info
-    movie_info_dict = {
-        'title': title,
-        'releaseYear': release,
-        'runtimeMins': runtime,
-        'genre': genre,
-        'director': director,
-        'worldwideGross': worldwide_gross,
-        'grossUSA': gross_usa,
-        'budget': budget,
-        'imdbRating': rating,
-        'listRank': rank,
-        'url': movie_url,
-    }
+    Returns
+    -------
+    generator
+        (url, html) tuples
+    '''
+    for url, body in get_cache_conn().execute('SELECT url, body FROM page'):
+        yield url, decompress_html(body)
+
+def evict_cache(max_bytes=None, max_age=None):
+    '''
+    Remove pages from the cache store. Pages older than max_age are removed first,
+    then the oldest pages are removed until the store holds at most max_bytes of
+    compressed HTML. Scraped values that no remaining page uses are removed too.
 
-    return movie_info_dict
+    Parameters
+    ----------
+    max_bytes: int
+        Largest total size of compressed HTML to keep. No size limit if None.
+    max_age: float
+        Age in seconds after which a page is removed. No age limit if None.
 
-def build_director_url_dict(movie_url):
+    Returns
+    -------
+    int
+        number of pages removed
     '''
-    Make a dictionary that maps director names to director urls from movie pages.
+    conn = get_cache_conn()
+    removed = 0
+    with conn:
+        if max_age is not None:
+            cur = conn.execute('DELETE FROM page WHERE fetchedAt < ?', (time.time() - max_age,))
+            removed += cur.rowcount
+
+        if max_bytes is not None:
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM page').fetchone()[0]
+            if total > max_bytes:
+                # Walk from the oldest page and count how many pages have to go
+                count = 0
+                for (size,) in conn.execute('SELECT size FROM page ORDER BY fetchedAt'):
+                    total -= size
+                    count += 1
+                    if total <= max_bytes:
+                        break
+                cur = conn.execute('''
+                    DELETE FROM page WHERE url IN (
+                        SELECT url FROM page ORDER BY fetchedAt LIMIT ?
+                    )
+                ''', (count,))
+                removed += cur.rowcount
+
+        if removed:
+            conn.execute('''
+                DELETE FROM extraction
+                WHERE contentHash NOT IN (SELECT contentHash FROM page WHERE contentHash IS NOT NULL)
+            ''')
+    return removed
+
+def cached_extract(url, extractor, parse):
+    '''
+    Get the scraped values of a page from the extraction cache. The cache is keyed by a
+    hash of the page's HTML and the extractor name and version, so a page whose HTML has
+    not changed is a lookup instead of a parse. On a miss the page is fetched through the
+    scrape cache, parsed, and the result saved.
 
     Parameters
     ----------
-    movie_url: string
-        URL for movie page on IMDb
+    url: string
+        The URL of the page.
+    extractor: string
+        Name of the kind of values scraped, e.g. 'movie'.
+    parse: function
+        Takes the page's HTML and returns the scraped values as a JSON-serializable dict.
 
     Returns
     -------
     dict
-        key is a director name and value is the director page url
-        e.g. {'The Shawshank Redemption':'https://www.imdb.com/title/tt0111161', ...}
+        the scraped values
     '''
+    conn = get_cache_conn()
+    extractor = f'{extractor}:{EXTRACTOR_VERSION}'
+
+    row = conn.execute('''
+        SELECT e.result
+        FROM page p
+        JOIN extraction e
+        ON e.contentHash = p.contentHash AND e.extractor = ?
+        WHERE p.url = ?
+    ''', (extractor, url)).fetchone()
+    if row:
+        return json.loads(row[0])
+
+    html = make_request_with_cache(url)
+    result = parse(html)
+    with conn:
+        conn.execute('''
+            INSERT OR REPLACE INTO extraction (contentHash, extractor, result)
+            VALUES (?, ?, ?)
+        ''', (hash_html(html), extractor, json.dumps(result)))
+    return result
+
+##### FETCH PAGES #####
+
+def get_session():
+    '''
+    Get the HTTP session shared by all crawl threads. The session keeps connections
+    alive, and its pool is sized so every crawl thread can hold a connection.
 
-    director_dict = {}
-
-    response = make_request_with_cache(movie_url, CACHE_DICT)
-    soup = BeautifulSoup(response, 'html.parser')
+    Parameters
+    ----------
+    None
 
-    director_name = soup.find(class_='credit_summary_item').find('a').text.title().strip()
-    url_exten = soup.find(class_='credit_summary_item').find('a').get('href')
-    director_url = BASEURL+url_exten
-    director_dict[director_name] = director_url
+    Returns
+    -------
+    requests.Session
+        the shared session
+    '''
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=CRAWL_CONCURRENCY)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+    return _session
+
+def wait_for_host(host):
+    '''
+    Block until the next request to a host is allowed by its rate limit, and reserve
+    that slot so other threads queue up behind it.
 
-    return director_dict
+    Parameters
+    ----------
+    host: string
+        Host name of the URL about to be fetched.
 
-def get_director_info(director_url):
-    ''' 
-    Get values from director site urls. Information to gather: Name, birth year, birth country, trademark, director credits,
-        director's site URL. 
+    Returns
+    -------
+    None
+    '''
+    with _host_lock:
+        state = _host_state.setdefault(host, {'interval': 1 / CRAWL_RATE, 'next': 0.0})
+        now = time.monotonic()
+        start = max(now, state['next'])
+        state['next'] = start + state['interval']
+    if start > now:
+        time.sleep(start - now)
+
+def adjust_host_rate(host, throttled, retry_after=None):
+    '''
+    Adapt the request rate for a host. A throttled response doubles the wait between
+    requests and pauses the host; every successful response slowly speeds back up
+    towards CRAWL_RATE.
 
     Parameters
     ----------
-    director_url: string
-        URL for director's page on IMDb
+    host: string
+        Host name of the fetched URL.
+    throttled: bool
+        True if the host answered 429 or 503.
+    retry_after: float
+        Seconds the host asked us to wait, if it sent a Retry-After header.
 
     Returns
     -------
-    dictionary movie information
-        keys are labels and value is the scraped information from web page
-        e.g. {'Name':'Frank Darabont', 'birthYear': 1959, ...}
+    None
     '''
-    response = make_request_with_cache(director_url, CACHE_DICT)
-    soup = BeautifulSoup(response, 'html.parser')
+    base = 1 / CRAWL_RATE
+    with _host_lock:
+        state = _host_state.setdefault(host, {'interval': base, 'next': 0.0})
+        if throttled:
+            state['interval'] = min(state['interval'] * 2, CRAWL_MAX_INTERVAL)
+            pause = retry_after if retry_after is not None else state['interval']
+            state['next'] = max(state['next'], time.monotonic() + pause)
+        else:
+            state['interval'] = max(base, state['interval'] * 0.75)
+
+def get_retry_after(response):
+    '''
+    Read the Retry-After header of a response as a number of seconds.
 
-    try:
-        if soup.find('div', class_='name-overview-widget'):
-            name_info = soup.find('div', class_='name-overview-widget')
-            name = name_info.find(class_='itemprop').text.strip()
-        elif soup.find(class_='article name-overview').find('h1').find('span'):
-            name = soup.find(class_='article name-overview').find('h1').find('span').text
-    except:
-        name = 'No info'
+    Parameters
+    ----------
+    response: requests.Response
+        Response from the host.
 
-    # try/except in case information is missing
+    Returns
+    -------
+    float
+        seconds to wait, or None if the header is missing or is not a number
+    '''
     try:
-        birth_info = soup.find(id='name-born-info')
-        birthYear = birth_info.find_all('a')[-2].text.strip()
-        birthplace = birth_info.find_all('a')[-1].text.strip()
-        if birthplace.split(',')[-1].strip():
-            country = birthplace.split(',')[-1].strip()
-            if country[-1] == ']':
-                country = country[:-1]
-                if '[' in country:
-                    country = country[:]+']'
-    except:
-        birthYear = "No info"
-        country = "No info"
+        return min(float(response.headers['Retry-After']), CRAWL_MAX_INTERVAL)
+    except (KeyError, ValueError):
+        return None
 
-    try:
-        trademark = soup.find(id='dyk-trademark').text[11:].split('See more')[0].strip()
-    except:
-        trademark = "No info"
+def fetch_page(url, headers=None):
+    '''
+    Fetch a page over the shared session, respecting the per-host rate limit and
+    backing off when the host answers 429 or 503.
 
-    try:
-        credit = soup.find(id='filmo-head-director').text.split('(')[1][:-2].split(' ')[0]
-    except:
-        credit = "No info"
+    Parameters
+    ----------
+    url: string
+        The URL to fetch.
+    headers: dict
+        Extra request headers, e.g. for a conditional request.
 
-    director_info_dict = {
-        'name': name,
-        'birthYear': birthYear,
-        'birthCountry': country,
-        'trademark': trademark,
-        'directorCredits': credit,
-        'url': director_url,
-    }
+    Returns
+    -------
+    requests.Response
+        the response from the host
+    '''
+    host = urlparse(url).netloc
+    for attempt in range(CRAWL_MAX_RETRIES + 1):
+        wait_for_host(host)
+        response = get_session().get(url, headers=headers, timeout=30)
+        if response.status_code in (429, 503):
+            adjust_host_rate(host, True, get_retry_after(response))
+            continue
+        adjust_host_rate(host, False)
+        return response
+    response.raise_for_status()
+
+def make_request_with_cache(baseurl):
+    '''
+    Check the cache for a saved result. If the result is found, return it. Otherwise send a new 
+    request, save it, then return it.
 
-    return director_info_dict
+    Parameters
+    ----------
+    baseurl: string
+        The URL for the website.
 
-##### WRITE DICTIONARIES TO CSV #####
+    Returns
+    -------
+    string
+        the HTML of the page, loaded from the cache if it was saved there
+    '''
+    html = cache_get(baseurl)
+    if html is not None:
+        print(f"Using cache")
+        return html
 
-def write_csv(filename, data):
+    print(f"Making a request")
+    response = fetch_page(baseurl)
+    html = response.text
+    cache_put(baseurl, html, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    return html
+
+def get_page_type(url):
     '''
-    Write <data> to the .csv file specified by <filename>
+    Tell which kind of IMDb page a URL is, to pick its freshness TTL.
 
     Parameters
     ----------
-    filename: string
-        the name of the csv file which will store the data
-    data: list
-        list of dictionaries to convert to csv
+    url: string
+        The URL of the page.
 
     Returns
     -------
-    None
+    string
+        'chart', 'title', 'name', or 'other'
     '''
+    if url == CHART_URL:
+        return 'chart'
+    path = urlparse(url).path
+    if path.startswith('/title/'):
+        return 'title'
+    if path.startswith('/name/'):
+        return 'name'
+    return 'other'
+
+def refresh_page(url):
+    '''
+    Get a page, revalidating the cached copy once its TTL has run out. A stale page is
+    requested with If-None-Match/If-Modified-Since, so an unchanged page costs a 304
+    response instead of a full download.
 
-    keys = data[0].keys()
-    a_file = open(filename, "w")
-    dict_writer = csv.DictWriter(a_file, keys)
-    dict_writer.writeheader()
-    dict_writer.writerows(data)
-    a_file.close()
-
-
-### BUILD DATABASE & TABLES ###
+    Parameters
+    ----------
+    url: string
+        The URL of the page.
 
-def create_db():
+    Returns
+    -------
+    tuple
+        the HTML of the page and True if it is new or changed since it was cached. The HTML is None
+        if the page is not cached and the host answered with an error, which is not cached either.
     '''
-    Create database to hold information for movies and directors with two tables: movieInfo and director.
+    entry = cache_get_entry(url)
+    ttl = CACHE_TTLS.get(get_page_type(url), CACHE_TTLS['other'])
+    if entry and time.time() - entry['fetchedAt'] < ttl:
+        return entry['body'], False
+
+    headers = {}
+    if entry and entry['etag']:
+        headers['If-None-Match'] = entry['etag']
+    if entry and entry['lastModified']:
+        headers['If-Modified-Since'] = entry['lastModified']
+
+    response = fetch_page(url, headers)
+    if entry and (response.status_code == 304 or response.status_code >= 400):
+        # Keep the cached copy if it is unchanged, or if the host failed to send a new one
+        cache_touch(url)
+        return entry['body'], False
+    if response.status_code >= 400:
+        return None, False
+
+    html = response.text
+    cache_put(url, html, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    return html, entry is None or entry['body'] != html
+
+##### PARSE PAGES #####
+
+# Tags kept when parsing each type of page: the classes, ids and itemprops the scrapers read
+CHART_STRAINER = {'classes': ['lister', 'posterColumn', 'titleColumn']}
+MOVIE_STRAINER = {
+    'classes': ['title_wrapper', 'credit_summary_item', 'txt-block'],
+    'itemprops': ['ratingValue'],
+}
+DIRECTOR_STRAINER = {
+    'classes': ['name-overview-widget', 'name-overview'],
+    'ids': ['name-born-info', 'dyk-trademark', 'filmo-head-director'],
+}
+
+@lru_cache(maxsize=None)
+def page_strainer_class():
+    '''
+    Get the PageStrainer class. It is made on first use, so bs4 is only imported by the
+    processes that parse pages.
 
     Parameters
     ----------
@@ -393,145 +869,2877 @@ def create_db():
 
     Returns
     -------
-    None
+    class
+        PageStrainer
     '''
+    from bs4 import SoupStrainer
+
+    class PageStrainer(SoupStrainer):
+        '''
+        SoupStrainer that keeps only the tags whose class, id, or itemprop is one the scrapers
+        read, along with everything inside them. The rest of the page is never built into a tree.
+        '''
+
+        def __init__(self, classes=(), ids=(), itemprops=()):
+            '''Make a strainer keeping the tags with any of these classes, ids or itemprops.'''
+            SoupStrainer.__init__(self)
+            self.keep_classes = set(classes)
+            self.keep_ids = set(ids)
+            self.keep_itemprops = set(itemprops)
+
+        def keep(self, attrs):
+            '''
+            Check the raw attributes of a tag that is about to be parsed.
+
+            Parameters
+            ----------
+            attrs: dict
+                Attributes of the tag.
+
+            Returns
+            -------
+            bool
+                True if the tag should be kept
+            '''
+            if not attrs:
+                return False
+            attrs = dict(attrs)
+            if attrs.get('id') in self.keep_ids or attrs.get('itemprop') in self.keep_itemprops:
+                return True
+            classes = attrs.get('class') or ''
+            if isinstance(classes, str):
+                classes = classes.split()
+            return not self.keep_classes.isdisjoint(classes)
+
+        # beautifulsoup4 before 4.13 asks search_tag
+        def search_tag(self, markup_name=None, markup_attrs=None):
+            '''Keep a tag if its attributes are read by the scrapers (beautifulsoup4 before 4.13).'''
+            if markup_attrs is None:
+                markup_attrs = {}
+            return self.keep(markup_attrs)
+
+        # beautifulsoup4 4.13 and later ask allow_tag_creation and allow_string_creation
+        def allow_tag_creation(self, nsprefix, name, attrs):
+            '''Keep a tag if its attributes are read by the scrapers (beautifulsoup4 4.13 and later).'''
+            return self.keep(attrs)
+
+        def allow_string_creation(self, string):
+            '''Never keep text outside the kept tags; text inside them is always kept.'''
+            return False
+
+    return PageStrainer
+
+def get_strainer(tags):
+    '''
+    Get the PageStrainer for one of the *_STRAINER tag lists, made once per list.
 
-    conn = sqlite3.connect('movie.db')
-    cur = conn.cursor()
+    Parameters
+    ----------
+    tags: dict
+        'classes', 'ids' and 'itemprops' to keep, e.g. MOVIE_STRAINER
+
+    Returns
+    -------
+    PageStrainer
+        the strainer
+    '''
+    key = tuple(sorted((name, tuple(values)) for name, values in tags.items()))
+    strainer = _strainers.get(key)
+    if strainer is None:
+        strainer = _strainers[key] = page_strainer_class()(**tags)
+    return strainer
+
+def make_soup(html, strainer, backend=None, partial=None):
+    '''
+    Parse a page with the configured parser backend, building only the parts kept by
+    the strainer when partial parsing is on.
+
+    Parameters
+    ----------
+    html: string
+        HTML of the page.
+    strainer: dict
+        Which parts of the page to build, e.g. MOVIE_STRAINER.
+    backend: string
+        BeautifulSoup parser name. Uses PARSER_BACKEND if None.
+    partial: bool
+        Whether to use the strainer. Uses PARTIAL_PARSING if None.
+
+    Returns
+    -------
+    BeautifulSoup
+        the parsed page
+    '''
+    from bs4 import BeautifulSoup
+
+    if backend is None:
+        backend = PARSER_BACKEND
+    if partial is None:
+        partial = PARTIAL_PARSING
+    if partial:
+        return BeautifulSoup(html, backend, parse_only=get_strainer(strainer))
+    return BeautifulSoup(html, backend)
+
+def verify_parser_backend(backend=PARSER_BACKEND, partial=True):
+    '''
+    Check that a parser backend and partial parsing give the same scraped values as a full
+    "html.parser" parse, field for field, on every page in the scrape cache.
+
+    Parameters
+    ----------
+    backend: string
+        BeautifulSoup parser name to check.
+    partial: bool
+        Whether to check with partial parsing on.
+
+    Returns
+    -------
+    dict
+        'checked' is the number of pages compared and 'mismatches' is a list of urls whose
+        values differ
+    '''
+    def scrape(url, html, backend, partial):
+        try:
+            if url == CHART_URL:
+                return parse_chart_html(html, backend, partial)
+            if '/title/' in url:
+                return parse_movie_html(html, backend, partial)
+            if '/name/' in url:
+                return parse_director_html(html, url, backend, partial)
+        except Exception as e:
+            # pages that break the scraper must break it the same way
+            return type(e).__name__
+        return None
+
+    checked = 0
+    mismatches = []
+    for url, html in iter_cache_pages():
+        expected = scrape(url, html, 'html.parser', False)
+        if expected is None:
+            continue
+        checked += 1
+        if scrape(url, html, backend, partial) != expected:
+            mismatches.append(url)
+
+    return {'checked': checked, 'mismatches': mismatches}
+
+##### CRAWL AND SCRAPE IMDb FOR MOVIE AND DIRECTOR INFORMATION #####
+
+def parse_chart_html(html, backend=None, partial=None):
+    '''
+    Parse the top 250 list page once and pull out everything the crawl needs from it.
+
+    Parameters
+    ----------
+    html: string
+        HTML of "https://www.imdb.com/chart/top-english-movies"
+    backend: string
+        BeautifulSoup parser name, see make_soup.
+    partial: bool
+        Whether to parse only the parts that are read, see make_soup.
+
+    Returns
+    -------
+    dict
+        'movies' maps lowercase movie titles to movie urls,
+        'rankings' maps ranks to movie titles,
+        'rank_index' maps lowercase movie titles to ranks
+    '''
+    soup = make_soup(html, CHART_STRAINER, backend, partial)
+
+    movie_dict = {}
+    search_div = soup.find('div', class_="lister")
+    for v in search_div.find_all(class_="titleColumn"):
+        value = v.find('a')
+        exten = value.get('href')
+        movie_name = value.text.lower().strip()
+        movie_dict[movie_name] = BASEURL+exten
+
+    #Get list of <td> elements for ranks and titles
+    ranks = soup.find_all('td', class_='posterColumn')
+    titles = soup.find_all('td', class_='titleColumn')
+
+    ranking_dict = {}
+    rank_index = {}
+    for num, name in zip(ranks, titles):
+        rank = num.find('span').get('data-value')
+        title = name.find('a').text
+        ranking_dict[rank] = title
+        rank_index[title.lower()] = rank
+
+    return {'movies': movie_dict, 'rankings': ranking_dict, 'rank_index': rank_index}
+
+def get_chart():
+    '''
+    Get the parsed top 250 list page. The parse is memoized by the content hash and fetch time
+    of the cached list page, so each movie of a crawl costs one small lookup in the cache store,
+    and the page is only read and parsed again after it is fetched again.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    dict
+        the parsed list page, see parse_chart_html
+    '''
+    conn = get_cache_conn()
+    query = 'SELECT contentHash, fetchedAt FROM page WHERE url = ?'
+    with _chart_lock:
+        version = conn.execute(query, (CHART_URL,)).fetchone()
+        if version is None or _chart_memo.get('version') != version:
+            html = make_request_with_cache(CHART_URL)
+            _chart_memo['chart'] = parse_chart_html(html)
+            _chart_memo['version'] = conn.execute(query, (CHART_URL,)).fetchone()
+        return _chart_memo['chart']
+
+def build_movie_url_dict():
+    ''' 
+    Make a dictionary that maps movie titles to movie title url from "https://www.imdb.com/chart/top-english-movies"
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    dict
+        key is a title name and value is the url
+        e.g. {'the shawshank redemption':'https://www.imdb.com/title/tt0111161', ...}
+    '''
+    return dict(get_chart()['movies'])
+
+def get_rankings_dict():
+    '''
+    Make a dictionary that maps movie rank on top 250 list to movie title from "https://www.imdb.com/chart/top-english-movies"
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    dict
+        key is a rank on list and value is the movie title
+        e.g. {1: 'The Shawshank Redemption', 2: 'The Godfather', ...}
+    '''
+    return dict(get_chart()['rankings'])
+
+def extract_title(soup):
+    '''
+    Get the movie title from a parsed movie page.
+
+    Parameters
+    ----------
+    soup: BeautifulSoup
+        Parsed movie page.
+
+    Returns
+    -------
+    string
+        the movie title
+    '''
+    title_wrapper = soup.find(class_='title_wrapper')
+    try:
+        return title_wrapper.find('h1', class_='').text[:-7].strip()
+    except:
+        return title_wrapper.find('h1', class_='long').text[:-7].strip()
+
+def extract_release_genre(soup):
+    '''
+    Get the release year and genre from a parsed movie page.
+
+    Parameters
+    ----------
+    soup: BeautifulSoup
+        Parsed movie page.
+
+    Returns
+    -------
+    tuple
+        release year and genre as strings
+    '''
+    title_wrapper = soup.find(class_='title_wrapper')
+    release = title_wrapper.find(id='titleYear').text[1:5]
+    genre = title_wrapper.find(class_="subtext").find('a').text
+    return release, genre
+
+def extract_director_link(soup):
+    '''
+    Get the director's name and page url from a parsed movie page.
+
+    Parameters
+    ----------
+    soup: BeautifulSoup
+        Parsed movie page.
+
+    Returns
+    -------
+    tuple
+        director name and director page url
+    '''
+    link = soup.find(class_='credit_summary_item').find('a')
+    return link.text.title().strip(), BASEURL+link.get('href')
+
+def extract_box_office(soup):
+    '''
+    Get worldwide gross, gross USA, budget, and runtime from the Box Office and Technical
+    Specs sections of a parsed movie page, walking the txt-block divs only once.
+
+    Parameters
+    ----------
+    soup: BeautifulSoup
+        Parsed movie page.
+
+    Returns
+    -------
+    dict
+        keys are worldwideGross, grossUSA, budget, and runtimeMins; missing values are "No info"
+    '''
+    labels = {
+        'Cumulative Worldwide Gross': 'worldwideGross',
+        'Gross USA': 'grossUSA',
+        'Budget': 'budget',
+        'Runtime': 'runtimeMins',
+    }
+    values = {key: "No info" for key in labels.values()}
+    # a field whose value could not be read stays "No info"
+    failed = set()
+
+    for all_txt in soup.find_all("div", class_="txt-block"):
+        found = all_txt.get_text(strip=True).split(':')
+        key = labels.get(found[0])
+        if key is None or key in failed:
+            continue
+        try:
+            if key == 'runtimeMins':
+                values[key] = found[1].split(' ')[0]
+            elif key == 'budget' and '$' not in found[1]:
+                values[key] = "No info"
+            else:
+                values[key] = found[1].split('(')[0][1:].replace(',','')
+        except:
+            values[key] = "No info"
+            failed.add(key)
+
+    return values
+
+def extract_rating(soup):
+    '''
+    Get the IMDb rating from a parsed movie page.
+
+    Parameters
+    ----------
+    soup: BeautifulSoup
+        Parsed movie page.
+
+    Returns
+    -------
+    string
+        the IMDb rating
+    '''
+    return soup.find(itemprop='ratingValue').text
+
+def parse_movie_html(html, backend=None, partial=None):
+    '''
+    Parse a movie page once and pull out the movie fields and the director link.
+    The list rank is not part of the movie page and is added by scrape_movie_page.
+
+    Parameters
+    ----------
+    html: string
+        HTML of a movie page on IMDb
+    backend: string
+        BeautifulSoup parser name, see make_soup.
+    partial: bool
+        Whether to parse only the parts that are read, see make_soup.
+
+    Returns
+    -------
+    dict
+        movie fields (title, releaseYear, runtimeMins, genre, director, worldwideGross, grossUSA,
+        budget, imdbRating) and the director's page url under 'directorUrl'
+    '''
+    soup = make_soup(html, MOVIE_STRAINER, backend, partial)
+
+    title = extract_title(soup)
+    release, genre = extract_release_genre(soup)
+    director, director_url = extract_director_link(soup)
+    box_office = extract_box_office(soup)
+
+    return {
+        'title': title,
+        'releaseYear': release,
+        'runtimeMins': box_office['runtimeMins'],
+        'genre': genre,
+        'director': director,
+        'worldwideGross': box_office['worldwideGross'],
+        'grossUSA': box_office['grossUSA'],
+        'budget': box_office['budget'],
+        'imdbRating': extract_rating(soup),
+        'directorUrl': director_url,
+    }
+
+def scrape_movie_page(movie_url):
+    '''
+    Fetch and parse a movie page once, returning both the movie information and the director link.
+
+    Parameters
+    ----------
+    movie_url: string
+        URL for movie page on IMDb
+
+    Returns
+    -------
+    tuple
+        movie information dictionary (see get_movie_info) and director dictionary (see build_director_url_dict)
+    '''
+    fields = cached_extract(movie_url, 'movie', parse_movie_html)
+
+    #Use title to look up the rank in the memoized index of the list page
+    rank = get_chart()['rank_index'].get(fields['title'].lower(), "No info")
+
+    # Create a dictionary with key, value pairs with the above info
+    movie_info_dict = {
+        'title': fields['title'],
+        'releaseYear': fields['releaseYear'],
+        'runtimeMins': fields['runtimeMins'],
+        'genre': fields['genre'],
+        'director': fields['director'],
+        'worldwideGross': fields['worldwideGross'],
+        'grossUSA': fields['grossUSA'],
+        'budget': fields['budget'],
+        'imdbRating': fields['imdbRating'],
+        'listRank': rank,
+        'url': movie_url,
+    }
+    director_dict = {fields['director']: fields['directorUrl']}
+
+    return movie_info_dict, director_dict
+
+def get_movie_info(movie_url):
+    ''' 
+    Get values from movie site urls. Information to gather: Title, Release Year, Runtime, Genre, 
+    Director, Worldwide Gross, Gross USA, Budget, IMDb Rating, Ranking in Top 250 list, movie site URL. 
+
+    Parameters
+    ----------
+    movie_url: string
+        URL for movie page on IMDb
+
+    Returns
+    -------
+    dictionary movie information
+        keys are labels and value is the scraped information from web page
+        e.g. {'Title':'The Shawshank Redemption', 'Release Year': 1994, ...}
+    '''
+    return scrape_movie_page(movie_url)[0]
+
+def build_director_url_dict(movie_url):
+    '''
+    Make a dictionary that maps director names to director urls from movie pages.
+
+    Parameters
+    ----------
+    movie_url: string
+        URL for movie page on IMDb
+
+    Returns
+    -------
+    dict
+        key is a director name and value is the director page url
+        e.g. {'The Shawshank Redemption':'https://www.imdb.com/title/tt0111161', ...}
+    '''
+    return scrape_movie_page(movie_url)[1]
+
+def parse_director_html(html, director_url, backend=None, partial=None):
+    ''' 
+    Parse a director page once and pull out the director information.
+
+    Parameters
+    ----------
+    html: string
+        HTML of a director's page on IMDb
+    director_url: string
+        URL for director's page on IMDb
+    backend: string
+        BeautifulSoup parser name, see make_soup.
+    partial: bool
+        Whether to parse only the parts that are read, see make_soup.
+
+    Returns
+    -------
+    dictionary director information, see get_director_info
+    '''
+    soup = make_soup(html, DIRECTOR_STRAINER, backend, partial)
+
+    try:
+        if soup.find('div', class_='name-overview-widget'):
+            name_info = soup.find('div', class_='name-overview-widget')
+            name = name_info.find(class_='itemprop').text.strip()
+        elif soup.find(class_='article name-overview').find('h1').find('span'):
+            name = soup.find(class_='article name-overview').find('h1').find('span').text
+    except:
+        name = 'No info'
+
+    # try/except in case information is missing
+    try:
+        birth_info = soup.find(id='name-born-info')
+        birthYear = birth_info.find_all('a')[-2].text.strip()
+        birthplace = birth_info.find_all('a')[-1].text.strip()
+        if birthplace.split(',')[-1].strip():
+            country = birthplace.split(',')[-1].strip()
+            if country[-1] == ']':
+                country = country[:-1]
+                if '[' in country:
+                    country = country[:]+']'
+    except:
+        birthYear = "No info"
+        country = "No info"
+
+    try:
+        trademark = soup.find(id='dyk-trademark').text[11:].split('See more')[0].strip()
+    except:
+        trademark = "No info"
+
+    try:
+        credit = soup.find(id='filmo-head-director').text.split('(')[1][:-2].split(' ')[0]
+    except:
+        credit = "No info"
+
+    director_info_dict = {
+        'name': name,
+        'birthYear': birthYear,
+        'birthCountry': country,
+        'trademark': trademark,
+        'directorCredits': credit,
+        'url': director_url,
+    }
+
+    return director_info_dict
+
+def get_director_info(director_url):
+    ''' 
+    Get values from director site urls. Information to gather: Name, birth year, birth country, trademark, director credits,
+        director's site URL. 
+
+    Parameters
+    ----------
+    director_url: string
+        URL for director's page on IMDb
+
+    Returns
+    -------
+    dictionary movie information
+        keys are labels and value is the scraped information from web page
+        e.g. {'Name':'Frank Darabont', 'birthYear': 1959, ...}
+    '''
+    # the url is not part of the page's HTML, so it is left out of the cached values
+    def parse(html):
+        director_info_dict = parse_director_html(html, director_url)
+        del director_info_dict['url']
+        return director_info_dict
+
+    director_info_dict = cached_extract(director_url, 'director', parse)
+    director_info_dict['url'] = director_url
+    return director_info_dict
+
+def iter_crawl(concurrency=CRAWL_CONCURRENCY):
+    '''
+    Crawl the top 250 list, every movie page and every director page using a pool of
+    threads, yielding records as soon as they are scraped. All pages go through the scrape
+    cache. Movies come in list order, and each director comes once, right before the first
+    movie that needs it. Only a small window of pages is in flight at a time, so memory
+    stays the same however long the list is.
+
+    Parameters
+    ----------
+    concurrency: int
+        Number of pages fetched at the same time.
+
+    Returns
+    -------
+    generator
+        ('director', director information dictionary) and ('movie', movie information dictionary) tuples
+    '''
+    movie_urls = iter(build_movie_url_dict().values())
+    window = concurrency * 2
+    seen = set()
+    pending = deque()
+    ready = deque()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        def submit_next():
+            movie_url = next(movie_urls, None)
+            if movie_url is not None:
+                pending.append(pool.submit(scrape_movie_page, movie_url))
+
+        for i in range(window):
+            submit_next()
+
+        while pending or ready:
+            if pending:
+                movie_info_dict, director_dict = pending.popleft().result()
+                submit_next()
+                for director_url in director_dict.values():
+                    if director_url not in seen:
+                        seen.add(director_url)
+                        ready.append(('director', pool.submit(get_director_info, director_url)))
+                ready.append(('movie', movie_info_dict))
+
+            # Hand records on in order, waiting for director pages only once the window is full
+            while ready and (len(ready) > window or not pending
+                             or not isinstance(ready[0][1], Future) or ready[0][1].done()):
+                kind, record = ready.popleft()
+                if isinstance(record, Future):
+                    record = record.result()
+                yield kind, record
+
+def crawl(concurrency=CRAWL_CONCURRENCY):
+    '''
+    Crawl the top 250 list, every movie page and every director page using a pool of
+    threads. Movies keep the order of the list and directors keep the order in which
+    their first movie appears, so the results match crawling the pages one at a time.
+
+    Parameters
+    ----------
+    concurrency: int
+        Number of pages fetched at the same time.
+
+    Returns
+    -------
+    tuple
+        list of movie information dictionaries and list of director information dictionaries
+    '''
+    movies = []
+    directors = []
+    for kind, record in iter_crawl(concurrency):
+        if kind == 'movie':
+            movies.append(record)
+        else:
+            directors.append(record)
+
+    return movies, directors
+
+def refresh_crawl(concurrency=CRAWL_CONCURRENCY):
+    '''
+    Incrementally refresh the scraped data. Cached pages whose TTL has run out are
+    revalidated with conditional requests, and only the movies and directors whose pages
+    changed are scraped again and upserted into the database. A changed list page
+    re-scrapes every movie, since their ranks may have moved, and clears the rank of the
+    movies that are no longer on it.
+
+    Parameters
+    ----------
+    concurrency: int
+        Number of pages fetched at the same time.
+
+    Returns
+    -------
+    dict
+        number of movies and directors that were upserted, and of movies that lost their rank
+    '''
+    chart_html, chart_changed = refresh_page(CHART_URL)
+    if chart_html is None:
+        # nothing to compare with until the list page can be fetched
+        return {'movies': 0, 'directors': 0, 'unranked': 0}
+    movie_urls = list(build_movie_url_dict().values())
+
+    conn = sqlite3.connect(DB_FILENAME)
+    cur = conn.cursor()
+    director_urls = [row[0] for row in cur.execute('SELECT url FROM director')]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        movies = []
+        for movie_url, (html, changed) in zip(movie_urls, pool.map(refresh_page, movie_urls)):
+            if changed or chart_changed:
+                movie_info_dict, director_dict = scrape_movie_page(movie_url)
+                movies.append(movie_info_dict)
+                director_urls.extend(director_dict.values())
+
+        # dict.fromkeys drops repeated urls and keeps their order
+        director_urls = list(dict.fromkeys(director_urls))
+        changed_urls = [url for url, (html, changed)
+                        in zip(director_urls, pool.map(refresh_page, director_urls)) if changed]
+        directors = list(pool.map(get_director_info, changed_urls))
+
+    upsert_directors(cur, directors)
+    upsert_movies(cur, movies)
+    unranked = clear_ranks(cur, movie_urls) if chart_changed else 0
+    if movies or directors or unranked:
+        bump_dataset_version(cur)
+    conn.commit()
+    conn.close()
+
+    return {'movies': len(movies), 'directors': len(directors), 'unranked': unranked}
+
+##### WRITE DICTIONARIES TO CSV #####
+
+def write_csv(filename, data):
+    '''
+    Write <data> to the .csv file specified by <filename>
+
+    Parameters
+    ----------
+    filename: string
+        the name of the csv file which will store the data
+    data: list
+        list of dictionaries to convert to csv
+
+    Returns
+    -------
+    None
+    '''
+
+    keys = data[0].keys()
+    a_file = open(filename, "w")
+    dict_writer = csv.DictWriter(a_file, keys)
+    dict_writer.writeheader()
+    dict_writer.writerows(data)
+    a_file.close()
+
+def write_arrow(filename, data, kind):
+    '''
+    Write movie or director information dictionaries to a typed Parquet file, or to an Arrow
+    IPC file if <filename> does not end in .parquet. Numbers are stored as numbers and
+    "No info" as null, so reading the file back needs no text parsing.
+
+    Parameters
+    ----------
+    filename: string
+        the name of the file, e.g. 'movie_info.parquet' or 'movie_info.arrow'
+    data: list
+        list of movie or director information dictionaries, scraped or already typed
+    kind: string
+        'movie' or 'director', selecting the columns of DATASET_COLUMNS
+
+    Returns
+    -------
+    None
+    '''
+    import pyarrow as pa
+
+    convert = {'int64': db_int, 'float64': db_real, 'string': db_text}
+    table = pa.table({
+        name: pa.array([convert[arrow_type](record[name]) for record in data], type=arrow_type)
+        for name, arrow_type in DATASET_COLUMNS[kind].items()
+    })
+    write_arrow_table(filename, table)
+
+def write_arrow_table(filename, table):
+    '''
+    Write a pyarrow Table to a Parquet file, or to an Arrow IPC file if <filename> does not end in .parquet.
+
+    Parameters
+    ----------
+    filename: string
+        the name of the file
+    table: pyarrow.Table
+        the table to write
+
+    Returns
+    -------
+    None
+    '''
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if filename.endswith('.parquet'):
+        pq.write_table(table, filename)
+    else:
+        with pa.OSFile(filename, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+def read_arrow(filename):
+    '''
+    Read a Parquet or Arrow IPC file written by write_arrow. The file is memory-mapped, so an
+    Arrow IPC file is used in place without being copied into memory.
+
+    Parameters
+    ----------
+    filename: string
+        the name of the file
+
+    Returns
+    -------
+    pyarrow.Table
+        the typed table
+    '''
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if filename.endswith('.parquet'):
+        return pq.read_table(filename, memory_map=True)
+    return pa.ipc.open_file(pa.memory_map(filename)).read_all()
+
+def iter_arrow(filename):
+    '''
+    Read the rows of a Parquet or Arrow IPC file written by write_arrow one batch at a time.
+
+    Parameters
+    ----------
+    filename: string
+        the name of the file
+
+    Returns
+    -------
+    generator
+        one dictionary of typed values per row, with None for missing values
+    '''
+    for batch in read_arrow(filename).to_batches():
+        yield from batch.to_pylist()
+
+def export_arrow(movie_file='movie_info.parquet', director_file='directors.parquet'):
+    '''
+    Export the movieInfo and director tables of the movie database to Parquet or Arrow IPC files
+    with write_arrow_table, keeping their column types.
+
+    Parameters
+    ----------
+    movie_file: string
+        the name of the movies file
+    director_file: string
+        the name of the directors file
+
+    Returns
+    -------
+    None
+    '''
+    import pyarrow as pa
+
+    conn = sqlite3.connect(DB_FILENAME)
+    queries = {
+        'movie': '''
+            SELECT title, releaseYear, runtimeMins, genre, d.name, worldwideGross, grossUSA, budget,
+                imdbRating, listRank, m.url
+            FROM movieInfo m
+            LEFT JOIN director d
+            ON m.directorId = d.id
+            ORDER BY m.id
+        ''',
+        'director': '''
+            SELECT name, birthYear, birthCountry, trademark, directorCredits, url
+            FROM director
+            ORDER BY id
+        ''',
+    }
+    try:
+        for kind, filename in (('movie', movie_file), ('director', director_file)):
+            columns = DATASET_COLUMNS[kind]
+            values = list(zip(*conn.execute(queries[kind]))) or [()] * len(columns)
+            table = pa.table({
+                name: pa.array(column, type=arrow_type)
+                for (name, arrow_type), column in zip(columns.items(), values)
+            })
+            write_arrow_table(filename, table)
+    finally:
+        conn.close()
+
+
+### BUILD DATABASE & TABLES ###
+
+def get_db_filename():
+    '''
+    Get the file name of the movie database read by the web app: the DB_FILENAME setting of
+    the running app, or DB_FILENAME outside of one.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    str
+        file name of the movie database
+    '''
+    if has_app_context():
+        return current_app.config['DB_FILENAME']
+    return DB_FILENAME
+
+def open_db(filename):
+    '''
+    Open a read-only connection to the movie database that memory-maps the file.
+
+    Parameters
+    ----------
+    filename: str
+        file name of the movie database
+
+    Returns
+    -------
+    sqlite3.Connection
+        read-only connection to the movie database; it may be passed between threads, but is
+        used by one at a time
+    '''
+    conn = sqlite3.connect(f'file:{filename}?mode=ro', uri=True, check_same_thread=False)
+    # read the file through memory mapping instead of read() calls
+    conn.execute(f'PRAGMA mmap_size = {DB_MMAP_SIZE}')
+    conn.execute('PRAGMA query_only = ON')
+    return conn
+
+def get_db():
+    '''
+    Get a read-only connection to the movie database. In the web app, each app context (a request,
+    including the streaming of its page) takes one from a pool of idle connections, opening one only
+    if the pool is empty, and close_db hands it back when the context ends. So the pages do not pay
+    for opening the database, SQLite's statement cache can reuse the parameterized queries, and a
+    server that runs every request on a new thread keeps at most DB_POOL_SIZE idle connections.
+    Outside the web app, the calling thread keeps its own connection.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    sqlite3.Connection
+        read-only connection to the movie database
+    '''
+    filename = get_db_filename()
+    if has_app_context():
+        if 'db' not in g:
+            with _db_pool_lock:
+                idle = _db_pool.get(filename)
+                conn = idle.pop() if idle else None
+            g.db = conn if conn is not None else open_db(filename)
+            g.db_filename = filename
+        return g.db
+
+    conn = getattr(_db_local, 'conn', None)
+    if conn is not None and _db_local.filename != filename:
+        conn.close()
+        conn = None
+    if conn is None:
+        conn = open_db(filename)
+        _db_local.conn = conn
+        _db_local.filename = filename
+    return conn
+
+def close_db(exception=None):
+    '''
+    Release the connection to the movie database taken by get_db: the app context's connection
+    goes back to the pool, or is closed if the pool is full, and the calling thread's connection
+    outside the web app is closed. The next get_db call takes or opens one again. Runs at the
+    end of every app context of the web app.
+
+    Parameters
+    ----------
+    exception: Exception
+        error that ended the app context, if any; passed by Flask and not used
+
+    Returns
+    -------
+    None
+    '''
+    if has_app_context() and 'db' in g:
+        conn = g.pop('db')
+        filename = g.pop('db_filename')
+        with _db_pool_lock:
+            idle = _db_pool.setdefault(filename, [])
+            if len(idle) < DB_POOL_SIZE:
+                idle.append(conn)
+                conn = None
+        if conn is not None:
+            conn.close()
+
+    conn = getattr(_db_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _db_local.conn = None
+
+def close_db_pool():
+    '''
+    Close the idle connections of the pool, e.g. before the process forks, since SQLite connections
+    must not be carried across a fork.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    '''
+    with _db_pool_lock:
+        connections = [conn for idle in _db_pool.values() for conn in idle]
+        _db_pool.clear()
+    for conn in connections:
+        conn.close()
+
+def create_db():
+    '''
+    Create database to hold information for movies and directors with two tables: movieInfo and director.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    '''
+
+    conn = sqlite3.connect(DB_FILENAME)
+    cur = conn.cursor()
+
+    # drop tables first to prevent issues during testing
+    drop_movie_table = '''
+        DROP TABLE IF EXISTS movieInfo;
+    '''
+
+    drop_director_table = '''
+        DROP TABLE IF EXISTS director;
+    '''
+
+    # WAL lets the web pages keep reading while the database is being written
+    cur.execute('PRAGMA journal_mode=WAL')
+    cur.execute(drop_movie_table)
+    cur.execute(drop_director_table)
+    for summary in DB_SUMMARIES:
+        cur.execute(f'DROP TABLE IF EXISTS {summary}')
+    for search in DB_SEARCH:
+        cur.execute(f'DROP TABLE IF EXISTS {search}')
+    create_tables(cur)
+    create_summary_tables(cur)
+    create_search_tables(cur)
+    create_indexes(cur)
+    create_meta_table(cur)
+    bump_dataset_version(cur)
+    cur.execute(f'PRAGMA user_version = {DB_SCHEMA_VERSION}')
+
+    conn.commit()
+    conn.close()
+
+def create_tables(cur, suffix=''):
+    '''
+    Create the movieInfo and director tables. Numbers are stored as INTEGER or REAL and
+    values missing from IMDb are stored as NULL.
+
+    Parameters
+    ----------
+    cur: sqlite3.Cursor
+        Cursor on the movie database.
+    suffix: string
+        Added to the table names, e.g. to build new tables next to old ones during a migration.
+
+    Returns
+    -------
+    None
+    '''
+    director_table = f'''
+        CREATE TABLE director{suffix} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name VARCHAR(255),
+            birthYear INTEGER,
+            birthCountry VARCHAR(255),
+            trademark VARCHAR(500),
+            directorCredits INTEGER,
+            url VARCHAR(255)
+        )
+    '''
+
+    movie_table = f'''
+        CREATE TABLE movieInfo{suffix} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, 
+            title VARCHAR(255),
+            releaseYear INTEGER,
+            runtimeMins INTEGER,
+            genre VARCHAR(255),
+            directorId INTEGER,
+            worldwideGross INTEGER,
+            grossUSA INTEGER,
+            budget INTEGER,
+            imdbRating REAL,
+            listRank INTEGER,
+            url VARCHAR(255),
+            FOREIGN KEY(directorId) REFERENCES director(id)
+            );
+    '''
+
+    cur.execute(movie_table)
+    cur.execute(director_table)
+
+def create_summary_tables(cur):
+    '''
+    Create the summary tables of DB_SUMMARIES if they do not exist yet. They hold the number
+    of rows and the min and max of a column for each genre, rating and country, so the web
+    pages can read dropdown values and result counts without scanning the movie tables.
+
+    Parameters
+    ----------
+    cur: sqlite3.Cursor
+        Cursor on the movie database.
+
+    Returns
+    -------
+    None
+    '''
+    for summary, (table, column, stat) in DB_SUMMARIES.items():
+        cur.execute(f'''
+            CREATE TABLE IF NOT EXISTS {summary} (
+                {column} PRIMARY KEY,
+                rowCount INTEGER,
+                minValue INTEGER,
+                maxValue INTEGER
+            )
+        ''')
+
+def refresh_summaries(cur, changed=None):
+    '''
+    Recompute rows of the summary tables from the movieInfo and director tables.
+
+    Parameters
+    ----------
+    cur: sqlite3.Cursor
+        Cursor on the movie database. The caller commits.
+    changed: dict
+        {summary table: set of grouped values} to recompute, e.g. the old and new genres of
+        upserted movies, including None for missing values. Each value is a lookup on the
+        indexes of DB_INDEXES. If None, every summary table is rebuilt with one pass over its table.
+
+    Returns
+    -------
+    None
+    '''
+    for summary, (table, column, stat) in DB_SUMMARIES.items():
+        column = column.split()[0]
+        select = f'''
+            SELECT {column}, COUNT(*), MIN({stat}), MAX({stat})
+            FROM {table}
+        '''
+        if changed is None:
+            cur.execute(f'DELETE FROM {summary}')
+            cur.execute(f'INSERT INTO {summary} {select} GROUP BY {column}')
+            continue
+        for value in changed.get(summary, ()):
+            cur.execute(f'DELETE FROM {summary} WHERE {column} IS ?', (value,))
+            cur.execute(f'INSERT INTO {summary} {select} WHERE {column} IS ? GROUP BY {column}', (value,))
+
+def create_search_tables(cur):
+    '''
+    Create the full-text search tables of DB_SEARCH if they do not exist yet. They index
+    movie titles and director names without storing another copy of them.
+
+    Parameters
+    ----------
+    cur: sqlite3.Cursor
+        Cursor on the movie database.
+
+    Returns
+    -------
+    None
+    '''
+    for search, (table, column, year) in DB_SEARCH.items():
+        cur.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {search}
+            USING fts5({column}, content='{table}', content_rowid='id', tokenize='trigram')
+        ''')
+
+def rebuild_search(cur):
+    '''
+    Rebuild the full-text search tables from the movieInfo and director tables.
+
+    Parameters
+    ----------
+    cur: sqlite3.Cursor
+        Cursor on the movie database. The caller commits.
+
+    Returns
+    -------
+    None
+    '''
+    for search in DB_SEARCH:
+        cur.execute(f"INSERT INTO {search}({search}) VALUES('rebuild')")
+
+def update_search(cur, search, rowid, old_text=None, new_text=None):
+    '''
+    Replace the indexed text of one movie or director in a full-text search table. The old
+    text must be the one that was indexed, since the table does not store it.
+
+    Parameters
+    ----------
+    cur: sqlite3.Cursor
+        Cursor on the movie database. The caller commits.
+    search: str
+        name of a search table in DB_SEARCH, e.g. 'movieSearch'
+    rowid: int
+        id of the movie or director
+    old_text: str
+        Indexed title or name to remove, if any.
+    new_text: str
+        Title or name to index, if any.
+
+    Returns
+    -------
+    None
+    '''
+    column = DB_SEARCH[search][1]
+    if old_text is not None:
+        cur.execute(f"INSERT INTO {search}({search}, rowid, {column}) VALUES('delete', ?, ?)", (rowid, old_text))
+    if new_text is not None:
+        cur.execute(f'INSERT INTO {search}(rowid, {column}) VALUES(?, ?)', (rowid, new_text))
+
+def create_meta_table(cur):
+    '''
+    Create the meta table of the movie database if it does not exist yet. It holds the
+    dataset version, which changes whenever the data does, and the time of that change.
+
+    Parameters
+    ----------
+    cur: sqlite3.Cursor
+        Cursor on the movie database.
+
+    Returns
+    -------
+    None
+    '''
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS meta (
+            key VARCHAR(255) PRIMARY KEY,
+            value
+        )
+    ''')
+
+def bump_dataset_version(cur):
+    '''
+    Increase the dataset version and record the time, after the movie database is rebuilt or
+    updated. The web pages derive their ETags from the version.
+
+    Parameters
+    ----------
+    cur: sqlite3.Cursor
+        Cursor on the movie database. The caller commits.
+
+    Returns
+    -------
+    None
+    '''
+    cur.execute('''
+        INSERT INTO meta VALUES ('datasetVersion', 1)
+        ON CONFLICT(key) DO UPDATE SET value = value + 1
+    ''')
+    cur.execute("INSERT OR REPLACE INTO meta VALUES ('updatedAt', ?)", (int(time.time()),))
+
+def migrate_db():
+    '''
+    Migrate a movie database built by an older version of the project. Before the typed schema
+    (version 1), "No info" becomes NULL, numbers stored as text become INTEGER or REAL, and the
+    query indexes are added. Before version 2, the summary tables are added, and before version
+    3 the full-text search tables, and before version 4 the meta table with the dataset version.
+    Databases that are already up to date are left alone.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    bool
+        True if the database was migrated
+    '''
+    conn = sqlite3.connect(DB_FILENAME, isolation_level=None)
+    # WAL lets the web pages keep reading while the database is being written
+    conn.execute('PRAGMA journal_mode=WAL')
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version >= DB_SCHEMA_VERSION:
+        conn.close()
+        return False
+
+    conn.create_function('db_int', 1, db_int)
+    conn.create_function('db_real', 1, db_real)
+    conn.create_function('db_text', 1, db_text)
+    cur = conn.cursor()
+
+    cur.execute('BEGIN')
+    try:
+        if version < 1:
+            create_tables(cur, '_new')
+            cur.execute('''
+                INSERT INTO director_new
+                SELECT id, name, db_int(birthYear), db_text(birthCountry), db_text(trademark),
+                    db_int(directorCredits), url
+                FROM director
+            ''')
+            cur.execute('''
+                INSERT INTO movieInfo_new
+                SELECT id, title, db_int(releaseYear), db_int(runtimeMins), db_text(genre), directorId,
+                    db_int(worldwideGross), db_int(grossUSA), db_int(budget), db_real(imdbRating),
+                    db_int(listRank), url
+                FROM movieInfo
+            ''')
+            cur.execute('DROP TABLE movieInfo')
+            cur.execute('DROP TABLE director')
+            cur.execute('ALTER TABLE director_new RENAME TO director')
+            cur.execute('ALTER TABLE movieInfo_new RENAME TO movieInfo')
+            create_indexes(cur)
+        if version < 2:
+            create_summary_tables(cur)
+            refresh_summaries(cur)
+        if version < 3:
+            create_search_tables(cur)
+            rebuild_search(cur)
+        create_meta_table(cur)
+        bump_dataset_version(cur)
+        cur.execute(f'PRAGMA user_version = {DB_SCHEMA_VERSION}')
+        cur.execute('COMMIT')
+    except:
+        cur.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+    return True
+
+def db_int(value):
+    '''
+    Convert a scraped value to an integer for the database.
+
+    Parameters
+    ----------
+    value: string
+        Scraped value, e.g. '142' or "No info".
+
+    Returns
+    -------
+    int
+        the value as an integer, or None if it is missing or not a number
+    '''
+    if value is None or isinstance(value, int):
+        return value
+    try:
+        return int(float(str(value).strip()))
+    except ValueError:
+        return None
+
+def db_real(value):
+    '''
+    Convert a scraped value to a float for the database.
+
+    Parameters
+    ----------
+    value: string
+        Scraped value, e.g. '8.7' or "No info".
+
+    Returns
+    -------
+    float
+        the value as a float, or None if it is missing or not a number
+    '''
+    if value is None or isinstance(value, float):
+        return value
+    try:
+        return float(str(value).strip())
+    except ValueError:
+        return None
+
+def db_text(value):
+    '''
+    Convert a scraped text value for the database.
+
+    Parameters
+    ----------
+    value: string
+        Scraped value, e.g. 'USA' or "No info".
+
+    Returns
+    -------
+    string
+        the value, or None if it is missing
+    '''
+    if value in (None, '', "No info"):
+        return None
+    return value
+
+def director_row(d):
+    '''
+    Turn a director information dictionary into the values of a director table row.
+
+    Parameters
+    ----------
+    d: dict
+        director information dictionary from get_director_info
+
+    Returns
+    -------
+    tuple
+        name, birthYear, birthCountry, trademark, directorCredits, and url
+    '''
+    return (d['name'], db_int(d['birthYear']), db_text(d['birthCountry']), db_text(d['trademark']),
+            db_int(d['directorCredits']), d['url'])
+
+def movie_row(m, directorId):
+    '''
+    Turn a movie information dictionary into the values of a movieInfo table row.
+
+    Parameters
+    ----------
+    m: dict
+        movie information dictionary from get_movie_info
+    directorId: int
+        id of the movie's director in the director table
+
+    Returns
+    -------
+    tuple
+        title, releaseYear, runtimeMins, genre, directorId, worldwideGross, grossUSA, budget,
+        imdbRating, listRank, and url
+    '''
+    return (m['title'], db_int(m['releaseYear']), db_int(m['runtimeMins']), db_text(m['genre']), directorId,
+            db_int(m['worldwideGross']), db_int(m['grossUSA']), db_int(m['budget']), db_real(m['imdbRating']),
+            db_int(m['listRank']), m['url'])
+
+def create_indexes(cur):
+    '''
+    Create the indexes of the movie database if they do not exist yet.
+
+    Parameters
+    ----------
+    cur: sqlite3.Cursor
+        Cursor on the movie database.
+
+    Returns
+    -------
+    None
+    '''
+    for name, statement in DB_INDEXES.items():
+        cur.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {statement}')
+
+def drop_indexes(cur):
+    '''
+    Drop the indexes of the movie database, e.g. before a bulk load.
+
+    Parameters
+    ----------
+    cur: sqlite3.Cursor
+        Cursor on the movie database.
+
+    Returns
+    -------
+    None
+    '''
+    for name in DB_INDEXES:
+        cur.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+def bulk_load(movies, directors):
+    '''
+    Load movies and directors into the (empty) tables of the movie database in one transaction.
+    Directors are inserted first, and each movie's directorId is resolved from an in-memory
+    map of director names (ignoring case) to ids instead of one query per movie. Indexes are dropped during
+    the load and built once at the end. Movies whose director is not found get a NULL directorId.
+
+    Parameters
+    ----------
+    movies: iterable
+        movie information dictionaries, e.g. from get_movie_info or read from movie_info.csv
+    directors: iterable
+        director information dictionaries, e.g. from get_director_info or read from directors.csv
+
+    Returns
+    -------
+    dict
+        number of directors and movies loaded, movies without a matching director, and seconds taken
+    '''
+    start = time.perf_counter()
+    conn = sqlite3.connect(DB_FILENAME, isolation_level=None)
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('PRAGMA cache_size=-65536')
+    cur = conn.cursor()
+
+    insert_director = '''
+        INSERT INTO director (name, birthYear, birthCountry, trademark, directorCredits, url)
+        VALUES (?, ?, ?, ?, ?, ?)
+    '''
+    insert_movie = '''
+        INSERT INTO movieInfo
+        VALUES (NULL,?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+
+    counts = {'directors': 0, 'movies': 0, 'unmatched': 0}
+
+    def director_rows():
+        for d in directors:
+            counts['directors'] += 1
+            yield director_row(d)
+
+    def movie_rows(director_ids):
+        for m in movies:
+            counts['movies'] += 1
+            directorId = director_ids.get((m['director'] or '').lower())
+            if directorId is None:
+                counts['unmatched'] += 1
+            yield movie_row(m, directorId)
+
+    cur.execute('BEGIN')
+    try:
+        drop_indexes(cur)
+        cur.executemany(insert_director, director_rows())
+        # directors whose name was scraped as "No info" have a NULL name and match no movie
+        director_ids = {name.lower(): director_id for director_id, name in cur.execute('SELECT id, name FROM director')
+                        if name is not None}
+        cur.executemany(insert_movie, movie_rows(director_ids))
+        create_indexes(cur)
+        refresh_summaries(cur)
+        rebuild_search(cur)
+        bump_dataset_version(cur)
+        cur.execute('COMMIT')
+    except:
+        cur.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+    counts['seconds'] = time.perf_counter() - start
+    print(f"Loaded {counts['directors']} directors and {counts['movies']} movies "
+          f"({counts['unmatched']} without a director) in {counts['seconds']:.2f}s")
+    return counts
+
+def read_csv(filename):
+    '''
+    Read the rows of a .csv file written by write_csv one at a time.
+
+    Parameters
+    ----------
+    filename: string
+        the name of the csv file
+
+    Returns
+    -------
+    generator
+        one dictionary per row, keyed by the header
+    '''
+    with open(filename, "r") as csvfile:
+        for row in csv.DictReader(csvfile):
+            yield row
+
+def load_csv_files(movie_csv='movie_info.csv', director_csv='directors.csv'):
+    '''
+    Populate the movieInfo and director tables from the csv files with bulk_load.
+
+    Parameters
+    ----------
+    movie_csv: string
+        the name of the movies csv file
+    director_csv: string
+        the name of the directors csv file
+
+    Returns
+    -------
+    dict
+        the load report from bulk_load
+    '''
+    return bulk_load(read_csv(movie_csv), read_csv(director_csv))
+
+def load_arrow_files(movie_file='movie_info.parquet', director_file='directors.parquet'):
+    '''
+    Populate the movieInfo and director tables from Parquet or Arrow IPC files written by
+    write_arrow or export_arrow with bulk_load. The values are already typed, so nothing is parsed.
+
+    Parameters
+    ----------
+    movie_file: string
+        the name of the movies file
+    director_file: string
+        the name of the directors file
+
+    Returns
+    -------
+    dict
+        the load report from bulk_load
+    '''
+    return bulk_load(iter_arrow(movie_file), iter_arrow(director_file))
+
+def update_movie_table():
+    '''
+    Add information from movie_info.csv to populate the movieInfo table in the movie database. 
+    Connect with director table to pull in foreign key information for directorId column.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    '''
+    bulk_load(read_csv('movie_info.csv'), [])
+
+def update_director_table():
+    '''
+    Add information from directors.csv to populate the director table in the movie database.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    '''
+    bulk_load([], read_csv('directors.csv'))
+
+
+def upsert_directors(cur, directors):
+    '''
+    Update directors already in the director table, matched on their page url, and insert the others.
+    The summary rows of their old and new countries and their search entries are updated.
+
+    Parameters
+    ----------
+    cur: sqlite3.Cursor
+        Cursor on the movie database. The caller commits.
+    directors: list
+        list of director information dictionaries from get_director_info
+
+    Returns
+    -------
+    dict
+        key is a lowercase director name and value is the director's id
+    '''
+    update_director = '''
+        UPDATE director
+        SET name = ?, birthYear = ?, birthCountry = ?, trademark = ?, directorCredits = ?
+        WHERE url = ?
+    '''
+    insert_director = '''
+        INSERT INTO director (name, birthYear, birthCountry, trademark, directorCredits, url)
+        VALUES (?, ?, ?, ?, ?, ?)
+    '''
+    director_ids = {}
+    countries = set()
+    for d in directors:
+        values = director_row(d)
+        old = cur.execute('SELECT id, birthCountry, name FROM director WHERE url = ?', (d['url'],)).fetchone()
+        if old is None:
+            cur.execute(insert_director, values)
+            director_ids[(d['name'] or '').lower()] = cur.lastrowid
+            update_search(cur, 'directorSearch', cur.lastrowid, new_text=values[0])
+        else:
+            cur.execute(update_director, values)
+            director_ids[(d['name'] or '').lower()] = old[0]
+            countries.add(old[1])
+            update_search(cur, 'directorSearch', old[0], old[2], values[0])
+        countries.add(values[2])
+    refresh_summaries(cur, {'countrySummary': countries})
+    return director_ids
+
+def upsert_movies(cur, movies, director_ids=None):
+    '''
+    Update movies already in the movieInfo table, matched on their page url, and insert the others.
+    Directors must be upserted first so the directorId can be looked up by name, ignoring case.
+    The summary rows of their old and new genres and ratings and their search entries are updated.
+
+    Parameters
+    ----------
+    cur: sqlite3.Cursor
+        Cursor on the movie database. The caller commits.
+    movies: list
+        list of movie information dictionaries from get_movie_info
+    director_ids: dict
+        Known director ids by lowercase name, e.g. from upsert_directors. Other names are looked up in the director table.
+
+    Returns
+    -------
+    None
+    '''
+    get_director_id = '''
+        SELECT id
+        FROM director
+        WHERE name = ? COLLATE NOCASE
+    '''
+    update_movie = '''
+        UPDATE movieInfo
+        SET title = ?, releaseYear = ?, runtimeMins = ?, genre = ?, directorId = ?, worldwideGross = ?,
+            grossUSA = ?, budget = ?, imdbRating = ?, listRank = ?
+        WHERE url = ?
+    '''
+    insert_movie = '''
+        INSERT INTO movieInfo
+        VALUES (NULL,?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    genres = set()
+    ratings = set()
+    for m in movies:
+        if director_ids and m['director'] and m['director'].lower() in director_ids:
+            directorId = director_ids[m['director'].lower()]
+        else:
+            result = cur.execute(get_director_id, (m['director'],)).fetchone()
+            directorId = result[0] if result else None
+        values = movie_row(m, directorId)
+        old = cur.execute('SELECT genre, imdbRating, id, title FROM movieInfo WHERE url = ?', (m['url'],)).fetchone()
+        if old is None:
+            cur.execute(insert_movie, values)
+            update_search(cur, 'movieSearch', cur.lastrowid, new_text=values[0])
+        else:
+            cur.execute(update_movie, values)
+            genres.add(old[0])
+            ratings.add(old[1])
+            update_search(cur, 'movieSearch', old[2], old[3], values[0])
+        genres.add(values[3])
+        ratings.add(values[8])
+    refresh_summaries(cur, {'genreSummary': genres, 'ratingSummary': ratings})
+
+def clear_ranks(cur, movie_urls):
+    '''
+    Set the listRank of the movies that are no longer on the top 250 list to NULL, so no two
+    movies share a rank after the list changes. The summary rows of their genres and ratings are updated.
+
+    Parameters
+    ----------
+    cur: sqlite3.Cursor
+        Cursor on the movie database. The caller commits.
+    movie_urls: list
+        page urls of the movies on the list
+
+    Returns
+    -------
+    int
+        number of movies whose rank was cleared
+    '''
+    listed = set(movie_urls)
+    dropped = [(movie_id, genre, rating) for movie_id, url, genre, rating
+               in cur.execute('SELECT id, url, genre, imdbRating FROM movieInfo WHERE listRank IS NOT NULL')
+               if url not in listed]
+    cur.executemany('UPDATE movieInfo SET listRank = NULL WHERE id = ?', [(movie_id,) for movie_id, _, _ in dropped])
+    refresh_summaries(cur, {'genreSummary': {genre for _, genre, _ in dropped},
+                            'ratingSummary': {rating for _, _, rating in dropped}})
+    return len(dropped)
+
+def stream_to_db(records, batch_size=DB_BATCH_SIZE, movie_csv=None, director_csv=None):
+    '''
+    Write scraped records into the movie database as they arrive, committing every batch_size
+    records so rows can be queried while the crawl is still running. Optionally also write
+    the records to CSV files.
+
+    Parameters
+    ----------
+    records: iterable
+        ('director', dict) and ('movie', dict) tuples, e.g. from iter_crawl. A director must
+        come before its movies.
+    batch_size: int
+        Number of records per transaction.
+    movie_csv: string
+        Name of a csv file to also write the movies to, if any.
+    director_csv: string
+        Name of a csv file to also write the directors to, if any.
+
+    Returns
+    -------
+    dict
+        number of movies and directors written
+    '''
+    conn = sqlite3.connect(DB_FILENAME)
+    cur = conn.cursor()
+
+    sinks = {'movie': movie_csv, 'director': director_csv}
+    files = []
+    writers = {}
+    batches = {'movie': [], 'director': []}
+    counts = {'movies': 0, 'directors': 0}
+    director_ids = {}
+
+    def flush():
+        if not batches['director'] and not batches['movie']:
+            return
+        director_ids.update(upsert_directors(cur, batches['director']))
+        upsert_movies(cur, batches['movie'], director_ids)
+        bump_dataset_version(cur)
+        conn.commit()
+        batches['director'].clear()
+        batches['movie'].clear()
+
+    try:
+        for kind, record in records:
+            batches[kind].append(record)
+            counts[kind + 's'] += 1
+
+            if sinks[kind]:
+                if kind not in writers:
+                    csv_file = open(sinks[kind], "w")
+                    files.append(csv_file)
+                    writers[kind] = csv.DictWriter(csv_file, record.keys())
+                    writers[kind].writeheader()
+                writers[kind].writerow(record)
+
+            if len(batches['movie']) + len(batches['director']) >= batch_size:
+                flush()
+        flush()
+    finally:
+        for csv_file in files:
+            csv_file.close()
+        conn.close()
+
+    return counts
+
+
+##### CATALOG SNAPSHOT #####
+
+def db_signature():
+    '''
+    Get the modification time and size of the movie database and its write-ahead log. Every
+    commit changes one of them, so an unchanged signature means unchanged data.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    tuple
+        the database file name, then (mtime in ns, size) of the database file and of its -wal
+        file, None if a file is missing
+    '''
+    db_filename = get_db_filename()
+    signature = [db_filename]
+    for filename in (db_filename, db_filename + '-wal'):
+        try:
+            stat = os.stat(filename)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+def load_snapshot():
+    '''
+    Read the movies and their directors from the movie database into NumPy column arrays
+    with one query.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    dict
+        'signature' from db_signature, 'size' (number of movies), 'columns' ({column name: array})
+        and 'categories' ({category column: sorted array of its values})
+    '''
+    signature = db_signature()
+    cur = get_db().execute(SNAPSHOT_QUERY)
+    names = [d[0] for d in cur.description]
+    rows = cur.fetchall()
+    values = list(zip(*rows)) if rows else [()] * len(names)
+
+    columns = {}
+    categories = {}
+    for name, column in zip(names, values):
+        if name in SNAPSHOT_TEXT:
+            columns[name] = np.array(column, dtype=object)
+        elif name in SNAPSHOT_CATEGORIES:
+            categories[name] = np.array(sorted({v for v in column if v is not None}), dtype=object)
+            codes = {v: i for i, v in enumerate(categories[name])}
+            columns[name] = np.fromiter((codes.get(v, -1) for v in column), dtype=np.int32, count=len(rows))
+        else:
+            columns[name] = np.array(column, dtype=float)
+    return {'signature': signature, 'size': len(rows), 'columns': columns, 'categories': categories}
+
+def get_snapshot():
+    '''
+    Get the columnar snapshot of the movie database, loading it again if the database has
+    changed since it was loaded.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    dict
+        snapshot from load_snapshot
+    '''
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is None or snapshot['signature'] != db_signature():
+        with _snapshot_lock:
+            if _snapshot is None or _snapshot['signature'] != db_signature():
+                _snapshot = load_snapshot()
+            snapshot = _snapshot
+    return snapshot
+
+def snapshot_mask(snapshot, present=(), **equals):
+    '''
+    Select snapshot rows by column values, e.g. snapshot_mask(s, genre='Drama', present=('budget',)).
+
+    Parameters
+    ----------
+    snapshot: dict
+        snapshot from get_snapshot
+    present: tuple
+        columns that must have a value
+    **equals:
+        column=value pairs the rows must match; None matches missing values
+
+    Returns
+    -------
+    numpy.ndarray
+        boolean mask over the snapshot rows
+    '''
+    columns = snapshot['columns']
+    mask = np.ones(snapshot['size'], dtype=bool)
+    for name in present:
+        mask &= ~snapshot_missing(snapshot, name)
+    for name, value in equals.items():
+        if value is None:
+            mask &= snapshot_missing(snapshot, name)
+        elif name in snapshot['categories']:
+            categories = snapshot['categories'][name]
+            i = np.searchsorted(categories, value)
+            found = i < len(categories) and categories[i] == value
+            mask &= columns[name] == (i if found else -2)
+        else:
+            mask &= columns[name] == value
+    return mask
+
+def snapshot_missing(snapshot, name):
+    '''
+    Get the rows of a snapshot column that have no value.
+
+    Parameters
+    ----------
+    snapshot: dict
+        snapshot from get_snapshot
+    name: str
+        column name
+
+    Returns
+    -------
+    numpy.ndarray
+        boolean mask over the snapshot rows
+    '''
+    column = snapshot['columns'][name]
+    if name in snapshot['categories']:
+        return column < 0
+    if name in SNAPSHOT_TEXT:
+        return np.equal(column, None)
+    return np.isnan(column)
+
+def snapshot_select(snapshot, names, mask=None):
+    '''
+    Get some columns of the selected snapshot rows, with category codes turned back into values.
 
-    # drop tables first to prevent issues during testing
-    drop_movie_table = '''
-        DROP TABLE IF EXISTS movieInfo;
+    Parameters
+    ----------
+    snapshot: dict
+        snapshot from get_snapshot
+    names: tuple
+        column names
+    mask: numpy.ndarray
+        boolean mask from snapshot_mask, or None for all rows
+
+    Returns
+    -------
+    dict
+        {column name: array}
     '''
+    selected = {}
+    for name in names:
+        column = snapshot['columns'][name]
+        if mask is not None:
+            column = column[mask]
+        if name in snapshot['categories']:
+            values = np.append(snapshot['categories'][name], None)
+            column = values[column]
+        selected[name] = column
+    return selected
+
+def snapshot_group(snapshot, by, name, how='sum', mask=None):
+    '''
+    Aggregate a column over the groups of another, e.g. total worldwide gross per genre with
+    snapshot_group(s, 'genre', 'worldwideGross'). Rows missing either value are left out.
 
-    drop_director_table = '''
-        DROP TABLE IF EXISTS director;
+    Parameters
+    ----------
+    snapshot: dict
+        snapshot from get_snapshot
+    by: str
+        column to group on
+    name: str
+        numeric column to aggregate
+    how: str
+        'count', 'sum', 'mean', 'min' or 'max'
+    mask: numpy.ndarray
+        boolean mask from snapshot_mask, or None for all rows
+
+    Returns
+    -------
+    dict
+        {group value: aggregate}, in order of the group values
     '''
+    keep = ~snapshot_missing(snapshot, by) & ~snapshot_missing(snapshot, name)
+    if mask is not None:
+        keep &= mask
+    values = snapshot['columns'][name][keep]
+    if by in snapshot['categories']:
+        groups = snapshot['categories'][by]
+        codes = snapshot['columns'][by][keep]
+    else:
+        groups, codes = np.unique(snapshot['columns'][by][keep], return_inverse=True)
+
+    counts = np.bincount(codes, minlength=len(groups))
+    if how == 'count':
+        result = counts
+    elif how in ('sum', 'mean'):
+        result = np.bincount(codes, weights=values, minlength=len(groups))
+        if how == 'mean':
+            result = result / np.maximum(counts, 1)
+    elif how == 'min':
+        result = np.full(len(groups), np.inf)
+        np.minimum.at(result, codes, values)
+    elif how == 'max':
+        result = np.full(len(groups), -np.inf)
+        np.maximum.at(result, codes, values)
+    else:
+        raise ValueError(f'unknown aggregate: {how}')
+    return {group.item() if isinstance(group, np.generic) else group: value.item()
+            for group, value, count in zip(groups, result, counts) if count}
 
-    director_table = '''
-        CREATE TABLE director (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name VARCHAR(255),
-            birthYear INTEGER,
-            birthCountry VARCHAR(255),
-            trademark VARCHAR(500),
-            directorCredits INTEGER,
-            url VARCHAR(255)
-        )
+def snapshot_histogram(snapshot, name, bins=10, mask=None):
     '''
+    Count the values of a numeric snapshot column in bins, e.g. the spread of IMDb ratings.
 
-    movie_table = '''
-        CREATE TABLE movieInfo (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, 
-            title VARCHAR(255),
-            releaseYear INTEGER,
-            runtimeMins INTEGER,
-            genre VARCHAR(255),
-            directorId INTEGER,
-            worldwideGross BIGINT,
-            grossUSA INTEGER,
-            budget INTEGER,
-            imdbRating INTEGER,
-            listRank INTEGER,
-            url VARCHAR(255),
-            FOREIGN KEY(directorId) REFERENCES director(id)
-            );
+    Parameters
+    ----------
+    snapshot: dict
+        snapshot from get_snapshot
+    name: str
+        numeric column
+    bins: int or sequence
+        number of equal-width bins, or the bin edges, as for numpy.histogram
+    mask: numpy.ndarray
+        boolean mask from snapshot_mask, or None for all rows
+
+    Returns
+    -------
+    tuple
+        (counts, bin edges) arrays
+    '''
+    keep = ~snapshot_missing(snapshot, name)
+    if mask is not None:
+        keep &= mask
+    return np.histogram(snapshot['columns'][name][keep], bins=bins)
+
+
+##### BUILD FLASK #####
+
+# Pages, API and hooks of the web app, registered on the app made by create_app
+views = Blueprint('views', __name__)
+
+def create_app(config=None):
+    '''
+    Make the web app. Serving only reads the movie database, so several worker processes can
+    share it; see gunicorn.conf.py for the production setup.
+
+    Parameters
+    ----------
+    config: dict
+        Flask settings overriding the defaults, e.g. {'DB_FILENAME': 'movie.db', 'DEBUG': True}.
+        DB_FILENAME is the movie database the pages read, BUILD_ASSETS turns build_assets off
+        and WARM_CACHES turns warm_caches off.
+
+    Returns
+    -------
+    Flask
+        the app
+    '''
+    app = Flask(__name__)
+    app.config.from_mapping(DEBUG=False, DB_FILENAME=DB_FILENAME, BUILD_ASSETS=True, WARM_CACHES=True,
+                            SEND_FILE_MAX_AGE_DEFAULT=1)
+    if config is not None:
+        app.config.from_mapping(config)
+    app.register_blueprint(views)
+    app.teardown_appcontext(close_db)
+
+    with app.app_context():
+        if app.config['BUILD_ASSETS']:
+            build_assets()
+        if app.config['WARM_CACHES']:
+            warm_caches()
+    return app
+
+def warm_caches():
+    '''
+    Fill the caches shared by all requests: the plotly.js bundle, the asset manifest, the app
+    fingerprint, the chart theme and the catalog snapshot. When this runs in the parent process
+    before the workers are forked (gunicorn's preload_app), every worker starts with them in
+    copy-on-write memory instead of building its own copy on its first requests. The database
+    connection used is closed again, as SQLite connections must not be carried across a fork.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    None
+    '''
+    get_plotly_js()
+    get_asset_manifest()
+    get_app_fingerprint()
+    get_chart_template()
+    try:
+        get_snapshot()
+    finally:
+        close_db()
+        close_db_pool()
+
+@views.app_template_filter('no_info')
+def no_info_filter(value):
+    '''
+    Show values that are missing from the database (NULL) as "No info".
+
+    Parameters
+    ----------
+    value
+        Value from a database row.
+
+    Returns
+    -------
+    the value, or "No info" if it is None
+    '''
+    if value is None:
+        return "No info"
+    return value
+
+@views.app_template_filter('dollars')
+def dollars_filter(value):
+    '''
+    Show an amount in USD with a dollar sign, or "No info" if it is missing.
+
+    Parameters
+    ----------
+    value: int
+        Amount from a database row.
+
+    Returns
+    -------
+    string
+        the amount with a dollar sign, or "No info"
+    '''
+    if value is None:
+        return "No info"
+    return f'${value}'
+
+def get_dataset_version():
+    '''
+    Get the dataset version of the movie database and the time it was last changed.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    tuple
+        (version, unix time of the change), (0, None) for a database without versions
+    '''
+    meta = dict(get_db().execute("SELECT key, value FROM meta WHERE key IN ('datasetVersion', 'updatedAt')"))
+    return meta.get('datasetVersion', 0), meta.get('updatedAt')
+
+def dataset_cache(function):
+    '''
+    Memoize a data function for the current dataset version. Results are keyed on the database,
+    its version and the arguments, so a rebuild or refresh of the database makes a new entry,
+    and entries of older versions are dropped as the cache fills up. Callers share the cached
+    rows and must not change them.
+
+    Parameters
+    ----------
+    function: function
+        data function whose arguments are hashable
+
+    Returns
+    -------
+    function
+        the memoized function
+    '''
+    @lru_cache(maxsize=DATASET_CACHE_SIZE)
+    def cached(dataset, *args, **kwargs):
+        return function(*args, **kwargs)
+
+    @wraps(function)
+    def dataset_cached(*args, **kwargs):
+        return cached((get_db_filename(), get_dataset_version()[0]), *args, **kwargs)
+    dataset_cached.cache_clear = cached.cache_clear
+    return dataset_cached
+
+def get_app_fingerprint():
+    '''
+    Get a fingerprint of this module and the templates, so ETags change when the pages'
+    code does, not only when the data does.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    str
+        hash of the modification times of the files
+    '''
+    global _app_fingerprint
+    if _app_fingerprint is None:
+        template_dir = os.path.join(current_app.root_path, current_app.template_folder)
+        files = [__file__] + [os.path.join(template_dir, name) for name in sorted(os.listdir(template_dir))]
+        mtimes = [os.stat(f).st_mtime_ns for f in files]
+        _app_fingerprint = hashlib.sha1(repr((mtimes, get_plotly_js()['fingerprint'])).encode()).hexdigest()
+    return _app_fingerprint
+
+def conditional(view):
+    '''
+    Make a view answer conditional requests. Its ETag is derived from the app's code, the dataset
+    version, the page and the form values. A GET whose If-None-Match still matches gets a 304
+    without running the view, and the browser reuses its copy of the page. There is no Last-Modified:
+    a time alone cannot tell one page or query from another. POST requests and error responses
+    get no ETag.
+
+    Parameters
+    ----------
+    view: function
+        Flask view function
+
+    Returns
+    -------
+    function
+        the wrapped view
+    '''
+    @wraps(view)
+    def conditional_view(*args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(*args, **kwargs)
+
+        version = get_dataset_version()[0]
+        inputs = sorted(request.args.items(multi=True))
+        etag = hashlib.sha1(repr((get_app_fingerprint(), version, request.path, inputs)).encode()).hexdigest()
+
+        if request.if_none_match.contains_weak(etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        # weak, since the page may be sent compressed or not
+        response.set_etag(etag, weak=True)
+        # the browser may keep the page but must check with the server before reusing it
+        response.cache_control.no_cache = True
+        return response
+    return conditional_view
+
+def get_plotly_js():
+    '''
+    Get the plotly.js bundle that matches the installed plotly package, and its fingerprint.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    dict
+        'js' (the bundle) and 'fingerprint' (start of its sha1), and its compressed variants by
+        encoding once plotly_js_view has made them
+    '''
+    if not _plotly_js:
+        # the bundle shipped in the plotly package, read without importing plotly's modules
+        js = pkgutil.get_data('plotly', 'package_data/plotly.min.js').decode('utf-8')
+        _plotly_js['fingerprint'] = hashlib.sha1(js.encode()).hexdigest()[:12]
+        _plotly_js['js'] = js
+    return _plotly_js
+
+@views.route('/plotly-<fingerprint>.js')
+def plotly_js_view(fingerprint):
+    '''
+    Serve the plotly.js bundle. Its URL contains its fingerprint, so browsers may cache it for a year.
+    A URL with any other fingerprint is redirected to the current one. The brotli or gzip variant
+    is compressed on the first request that accepts it and kept with the bundle.
+
+    Parameters
+    ----------
+    fingerprint: str
+        fingerprint from get_plotly_js
+
+    Returns
+    -------
+    the JavaScript bundle, or a redirect to its current URL
+    '''
+    bundle = get_plotly_js()
+    if fingerprint != bundle['fingerprint']:
+        return redirect(url_for('views.plotly_js_view', fingerprint=bundle['fingerprint']))
+
+    encoding = None
+    if brotli is not None and request.accept_encodings['br']:
+        encoding = 'br'
+    elif request.accept_encodings['gzip']:
+        encoding = 'gzip'
+    if encoding is not None and encoding not in bundle:
+        js = bundle['js'].encode('utf-8')
+        bundle[encoding] = brotli.compress(js, quality=11) if encoding == 'br' else gzip.compress(js, compresslevel=9)
+
+    response = current_app.response_class(bundle.get(encoding, bundle['js']), mimetype='application/javascript')
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(bundle['fingerprint'] + (f'-{encoding}' if encoding else ''))
+    response.cache_control.public = True
+    response.cache_control.max_age = 365 * 24 * 60 * 60
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+def build_assets():
+    '''
+    Copy the files under static/ and the plotly.js bundle to static/ASSET_DIR, with a hash of
+    their content in the name (css/style.css becomes css/style.<hash>.css). Text files also
+    get .gz and, when brotli is installed, .br variants compressed at the highest level. url()
+    references between the files are rewritten to the fingerprinted names. Files that are
+    already built are skipped and manifest.json is only rewritten when it changed, so running
+    it again is cheap. Each file is written to a temporary file and renamed into place.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    dict
+        the manifest, {source path: fingerprinted path}, also written to manifest.json
+    '''
+    global _asset_manifest
+    static_dir = current_app.static_folder
+    out_dir = os.path.join(static_dir, ASSET_DIR)
+
+    sources = {}
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != out_dir]
+        for name in files:
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                sources[os.path.relpath(path, static_dir).replace(os.sep, '/')] = f.read()
+    sources['js/plotly.min.js'] = get_plotly_js()['js'].encode()
+
+    manifest = {}
+    # css last, so the files it refers to already have their fingerprinted names
+    for path in sorted(sources, key=lambda path: path.endswith('.css')):
+        content = sources[path]
+        if path.endswith('.css'):
+            content = rewrite_css_urls(path, content, manifest)
+        stem, ext = os.path.splitext(path)
+        built = f'{stem}.{hashlib.sha1(content).hexdigest()[:12]}{ext}'
+        manifest[path] = built
+
+        target = os.path.join(out_dir, built)
+        if os.path.exists(target):
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        variants = {'': content}
+        if mimetypes.guess_type(path)[0] in COMPRESS_MIMETYPES:
+            variants['.gz'] = gzip.compress(content, compresslevel=9)
+            if brotli is not None:
+                variants['.br'] = brotli.compress(content)
+        # the plain file is written last: its presence marks the asset as built
+        for suffix in ('.gz', '.br', ''):
+            if suffix in variants:
+                write_file_atomic(target + suffix, variants[suffix])
+
+    manifest_path = os.path.join(out_dir, 'manifest.json')
+    data = json.dumps(manifest, indent=1, sort_keys=True).encode()
+    try:
+        with open(manifest_path, 'rb') as f:
+            unchanged = f.read() == data
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        write_file_atomic(manifest_path, data)
+    _asset_manifest = manifest
+    return manifest
+
+def write_file_atomic(path, data):
+    '''
+    Write a file through a temporary file in the same folder, renamed over the path once it
+    is complete, so a worker reading it at the same time never sees half a file.
+
+    Parameters
+    ----------
+    path: str
+        the file to write
+    data: bytes
+        its content
+
+    Returns
+    -------
+    None
+    '''
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def rewrite_css_urls(path, content, manifest):
+    '''
+    Point the url() references of a stylesheet at the fingerprinted names of the files.
+
+    Parameters
+    ----------
+    path: str
+        path of the stylesheet under static/, e.g. 'css/style.css'
+    content: bytes
+        the stylesheet
+    manifest: dict
+        fingerprinted paths of the files built so far
+
+    Returns
+    -------
+    bytes
+        the stylesheet with rewritten references
+    '''
+    folder = os.path.dirname(path)
+
+    def replace(match):
+        quote, url = match.group(1), match.group(2)
+        target = os.path.normpath(os.path.join(folder, url)).replace(os.sep, '/')
+        if target not in manifest:
+            return match.group(0)
+        built = os.path.relpath(manifest[target], folder).replace(os.sep, '/')
+        return f'url({quote}{built}{quote})'
+
+    return re.sub(r"url\((['\"]?)([^'\")]+)\1\)", replace, content.decode()).encode()
+
+def get_asset_manifest():
+    '''
+    Get the manifest written by build_assets, or an empty one if the assets were not built.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    dict
+        {source path: fingerprinted path}
+    '''
+    global _asset_manifest
+    if _asset_manifest is None:
+        try:
+            with open(os.path.join(current_app.static_folder, ASSET_DIR, 'manifest.json')) as f:
+                _asset_manifest = json.load(f)
+        except FileNotFoundError:
+            _asset_manifest = {}
+    return _asset_manifest
+
+def asset_url(path):
+    '''
+    Get the URL of a static file: its fingerprinted, long-cached URL if the assets were built,
+    else its plain /static/ URL.
+
+    Parameters
+    ----------
+    path: str
+        path under static/, e.g. 'css/style.css'
+
+    Returns
+    -------
+    str
+        the URL
+    '''
+    built = get_asset_manifest().get(path)
+    if built is None:
+        return url_for('static', filename=path)
+    return url_for('views.asset_view', filename=built)
+
+@views.route('/assets/<path:filename>')
+def asset_view(filename):
+    '''
+    Serve a fingerprinted asset built by build_assets, picking its brotli or gzip variant when the
+    browser accepts it. Its content never changes under this URL, so it is cached for a year.
+
+    Parameters
+    ----------
+    filename: str
+        fingerprinted path, e.g. 'css/style.<hash>.css'
+
+    Returns
+    -------
+    the asset
+    '''
+    directory = os.path.join(current_app.static_folder, ASSET_DIR)
+    mimetype = mimetypes.guess_type(filename)[0]
+    response = None
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[encoding]:
+            try:
+                response = send_from_directory(directory, filename + suffix, mimetype=mimetype)
+            except NotFound:
+                continue
+            response.headers['Content-Encoding'] = encoding
+            break
+    if response is None:
+        response = send_from_directory(directory, filename)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.max_age = ASSET_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+@views.app_context_processor
+def asset_urls():
+    '''
+    Give the templates asset_url and the URL of the plotly.js bundle as plotly_js.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    dict
+        template variables
+    '''
+    if 'js/plotly.min.js' in get_asset_manifest():
+        plotly_url = asset_url('js/plotly.min.js')
+    else:
+        plotly_url = url_for('views.plotly_js_view', fingerprint=get_plotly_js()['fingerprint'])
+    return {'asset_url': asset_url, 'plotly_js': plotly_url}
+
+def get_chart_template():
+    '''
+    Get plotly's default "plotly" theme, read from the plotly package data, so the charts
+    look the same as plotly's own figures without building them with plotly.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    dict
+        the layout template
+    '''
+    global _chart_template
+    if _chart_template is None:
+        _chart_template = json.loads(pkgutil.get_data('plotly', 'package_data/templates/plotly.json'))
+    return _chart_template
+
+def bar_trace(name, x, y, color, hovertemplate, hovertext=None):
+    '''
+    Make the spec of one series of a bar chart, like plotly.express.bar does.
+
+    Parameters
+    ----------
+    name: str
+        name of the series in the legend
+    x: list
+        bar positions
+    y: list
+        bar heights
+    color: str
+        bar color
+    hovertemplate: str
+        plotly hover label template
+    hovertext: list
+        text of each bar's hover label, or None
+
+    Returns
+    -------
+    dict
+        the trace spec
+    '''
+    trace = {'type': 'bar', 'name': name, 'legendgroup': name, 'showlegend': True, 'orientation': 'v',
+             'textposition': 'auto', 'x': x, 'y': y, 'xaxis': 'x', 'yaxis': 'y', 'marker': {'color': color},
+             'hovertemplate': hovertemplate}
+    if hovertext is not None:
+        trace['hovertext'] = hovertext
+    return trace
+
+def bar_layout(x_title, y_title, legend_title):
+    '''
+    Make the layout spec of a bar chart, like plotly.express.bar does.
+
+    Parameters
+    ----------
+    x_title: str
+        title of the x axis
+    y_title: str
+        title of the y axis
+    legend_title: str
+        title of the legend
+
+    Returns
+    -------
+    dict
+        the layout spec
+    '''
+    return {'template': get_chart_template(),
+            'xaxis': {'anchor': 'y', 'domain': [0.0, 1.0], 'title': {'text': x_title}},
+            'yaxis': {'anchor': 'x', 'domain': [0.0, 1.0], 'title': {'text': y_title}},
+            'legend': {'title': {'text': legend_title}, 'tracegroupgap': 0},
+            'margin': {'t': 60}, 'barmode': 'relative'}
+
+def rating_chart(ranks, titles, gross, budget):
+    '''
+    Make the bar chart of the ratings page: budget and worldwide gross against rank.
+
+    Parameters
+    ----------
+    ranks: list
+        listRank of each movie
+    titles: list
+        title of each movie
+    gross: list
+        worldwideGross of each movie
+    budget: list
+        budget of each movie
+
+    Returns
+    -------
+    dict
+        chart spec with 'data' and 'layout'
     '''
+    data = [bar_trace(name, ranks, values, BOXOFFICE_COLORS[name],
+                      f'<b>%{{hovertext}}</b><br><br>variable={name}<br>rank=%{{x}}<br>value=%{{y}}<extra></extra>', titles)
+            for name, values in (('budget', budget), ('gross', gross))]
+    return {'data': data, 'layout': bar_layout('Rank', 'Amount in USD', 'variable')}
 
-    cur.execute(drop_movie_table)
-    cur.execute(drop_director_table)
-    cur.execute(movie_table)
-    cur.execute(director_table)
-
-    conn.commit()
-    conn.close()
+def director_chart(names, credits, countries):
+    '''
+    Make the bar chart of the directors page: directing credits per director, one colored
+    series per birth country in the order the countries first appear.
 
+    Parameters
+    ----------
+    names: list
+        name of each director
+    credits: list
+        directorCredits of each director
+    countries: list
+        birthCountry of each director
 
-def update_movie_table():
+    Returns
+    -------
+    dict
+        chart spec with 'data' and 'layout'
     '''
-    Add information from movie_info.csv to populate the movieInfo table in the movie database. 
-    Connect with director table to pull in foreign key information for directorId column.
+    series = {}
+    for name, credit, country in zip(names, credits, countries):
+        x, y = series.setdefault(country, ([], []))
+        x.append(name)
+        y.append(credit)
+    data = [bar_trace(country, x, y, CHART_COLORS[i % len(CHART_COLORS)],
+                      f'country={country}<br>name=%{{x}}<br>credits=%{{y}}<extra></extra>')
+            for i, (country, (x, y)) in enumerate(series.items())]
+    return {'data': data, 'layout': bar_layout('Director Name', '# of Directing Credits', 'country')}
+
+def radar_chart(movies, theta):
+    '''
+    Make the radar chart of the comparison page, one filled outline per movie.
 
     Parameters
     ----------
-    None
+    movies: list
+        (title, values, color) of each movie, with one value per theta
+    theta: list
+        names of the values, around the chart
 
     Returns
     -------
-    None
+    dict
+        chart spec with 'data' and 'layout'
     '''
+    data = [{'type': 'scatterpolar', 'name': title, 'r': values, 'theta': theta, 'fill': 'toself',
+             'line': {'color': color}} for title, values, color in movies]
+    return {'data': data, 'layout': {'template': get_chart_template()}}
 
-    conn = sqlite3.connect('movie.db')
-    cur = conn.cursor()
+def chart_html(chart):
+    '''
+    Render a chart as a <div> and a short script that draws it in the browser from its JSON
+    spec. plotly.js itself is loaded once from the plotly_js URL.
 
-    # SET UP QUERIES
-    get_director_id = '''
-        SELECT id
-        FROM director
-        WHERE name = ?
+    Parameters
+    ----------
+    chart: dict
+        chart spec with 'data' and 'layout', e.g. from rating_chart
+
+    Returns
+    -------
+    str
+        HTML for the chart
     '''
+    div_id = str(uuid.uuid4())
+    # escaped so text in the data cannot close the script tag
+    data, layout = (json.dumps(chart[key], separators=(',', ':')).replace('<', '\\u003c').replace('>', '\\u003e')
+                    .replace('&', '\\u0026') for key in ('data', 'layout'))
+    return (f'<div style="height:100%; width:100%;"><div id="{div_id}" class="plotly-graph-div" '
+            f'style="height:100%; width:100%;"></div><script>window.PLOTLYENV=window.PLOTLYENV || {{}};'
+            f'if (document.getElementById("{div_id}")) {{Plotly.newPlot("{div_id}", {data}, {layout}, '
+            f'{{"responsive": true}})}};</script></div>')
+
+def stream_page(template_name, **context):
+    '''
+    Render a template as a streamed response: the page is sent STREAM_FLUSH_BYTES at a time as
+    it renders, so the browser gets the top of the page before the last table row is read, and
+    the rows of an iterator are never all in memory.
 
-    insert_data = '''
-        INSERT INTO movieInfo
-        VALUES (NULL,?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    Parameters
+    ----------
+    template_name: str
+        name of the template, e.g. 'ratings.html'
+    context:
+        template variables; the rows may be an iterator
+
+    Returns
+    -------
+    Response
+        the streamed page
     '''
+    current_app.update_template_context(context)
+    template = current_app.jinja_env.get_template(template_name)
+
+    def generate():
+        buffer = []
+        size = 0
+        for piece in template.generate(context):
+            buffer.append(piece)
+            size += len(piece)
+            if size >= STREAM_FLUSH_BYTES:
+                yield ''.join(buffer)
+                buffer = []
+                size = 0
+        if buffer:
+            yield ''.join(buffer)
+
+    return current_app.response_class(stream_with_context(generate()), mimetype='text/html')
+
+def gzip_stream(chunks):
+    '''
+    Compress a streamed response with gzip, flushing the compressor after every chunk so the
+    browser can show each part of the page as soon as it arrives.
 
-    # Open movies csv file and skip header
-    with open("movie_info.csv", "r") as csvfile:
-        csvreader = csv.reader(csvfile)
-        #skip header row
-        next(csvreader)
-
-        #Connect id from director table to movieInfo table on director name/id 
-        for row in csvreader:
-            cur.execute(get_director_id, (row[4],))
-            result = cur.fetchone()
-            if result:
-                directorId = result[0]
-
-            #Insert data from csv into database table
-            cur.execute(insert_data, (
-                row[0], #title
-                row[1], #releaseYear
-                row[2], #runtimeMins
-                row[3], #genre
-                directorId,
-                row[5], #worldwideGross
-                row[6], #grossUSA
-                row[7], #budget
-                row[8], #imdbRating
-                row[9], #ranking
-                row[10], #url
-            ))
+    Parameters
+    ----------
+    chunks: iterable
+        str or bytes chunks of the response; str is encoded as UTF-8
 
-    conn.commit()
-    conn.close()
+    Returns
+    -------
+    generator
+        gzip-compressed chunks
+    '''
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
 
-def update_director_table():
+# Set up home page (index.html)
+@dataset_cache
+def count_rows(summary, value=None, limit=-1):
     '''
-    Add information from directors.csv to populate the director table in the movie database.
+    Get the number of rows with a genre, rating or country from its summary table instead of
+    counting them in the movieInfo or director table.
 
     Parameters
     ----------
-    None
+    summary: str
+        name of a summary table in DB_SUMMARIES, e.g. 'genreSummary'
+    value: str
+        Value of the grouped column to count, e.g. a genre. If None, all rows are counted.
+    limit: int
+        The count is capped at limit, like the LIMIT of the query being counted. Negative means no limit.
 
     Returns
     -------
-    None
+    int
+        number of rows
     '''
+    cur = get_db().cursor()
+    column = DB_SUMMARIES[summary][1].split()[0]
+    if value is None:
+        result = cur.execute(f'SELECT SUM(rowCount) FROM {summary}').fetchone()
+    else:
+        result = cur.execute(f'SELECT rowCount FROM {summary} WHERE {column} = ?', (value,)).fetchone()
+    row_count = result[0] if result and result[0] else 0
+    if limit >= 0:
+        row_count = min(row_count, limit)
+    return row_count
 
-    directors = pd.read_csv('directors.csv', header=0)
-    conn = sqlite3.connect('movie.db')
-    directors.to_sql('director', conn, if_exists='append', index=False)
+def trigrams(text):
+    '''
+    Get the lowercase three-character sequences of a string, as the trigram tokenizer sees them.
 
+    Parameters
+    ----------
+    text: str
+        a title, name or search query
 
-##### BUILD FLASK #####
+    Returns
+    -------
+    set
+        trigrams of the text
+    '''
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
 
-app = Flask(__name__)
-app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 1
+def search_catalog(query, limit=SEARCH_LIMIT, kinds=('movie', 'director')):
+    '''
+    Search movie titles and director names. Names that start with the query come first, then
+    names that contain it, then fuzzy matches that share most of the query's trigrams, so
+    typos like "godfathr" still find a movie.
 
-# Set up home page (index.html)
-@app.route('/', methods=['GET', 'POST'])
+    Parameters
+    ----------
+    query: str
+        text typed by the user
+    limit: int
+        largest number of results
+    kinds: tuple
+        'movie' and/or 'director'
+
+    Returns
+    -------
+    list
+        dictionaries with the id, kind ('movie' or 'director'), name and year of each match,
+        best match first
+    '''
+    # % and _ are LIKE wildcards; titles rarely contain them
+    query = ' '.join(query.replace('%', ' ').replace('_', ' ').split())
+    if not query:
+        return []
+    query_grams = trigrams(query)
+
+    cur = get_db().cursor()
+    matches = {}
+    for search, (table, column, year) in DB_SEARCH.items():
+        kind = 'movie' if table == 'movieInfo' else 'director'
+        if kind not in kinds:
+            continue
+        select = f'''
+            SELECT s.rowid, s.{column}, t.{year}
+            FROM {search} s
+            JOIN {table} t
+            ON t.id = s.rowid
+        '''
+        # tier 0: starts with the query, tier 1: contains it
+        for tier, pattern in enumerate([f'{query}%', f'%{query}%']):
+            for rowid, name, name_year in cur.execute(f'{select} WHERE s.{column} LIKE ? LIMIT ?', (pattern, limit)):
+                matches.setdefault((kind, rowid), (tier, len(name), name, name_year))
+        if len(matches) < limit and query_grams:
+            fuzzy = ' OR '.join('"' + gram.replace('"', '""') + '"' for gram in query_grams)
+            candidates = cur.execute(f'{select} WHERE {search} MATCH ? ORDER BY rank LIMIT ?', (fuzzy, limit * 5))
+            for rowid, name, name_year in candidates:
+                shared = len(query_grams & trigrams(name)) / len(query_grams)
+                if shared >= 0.5:
+                    matches.setdefault((kind, rowid), (3 - shared, len(name), name, name_year))
+
+    ranked = sorted(matches.items(), key=lambda item: item[1][:2])[:limit]
+    return [{'id': rowid, 'kind': kind, 'name': name, 'year': name_year}
+            for (kind, rowid), (tier, length, name, name_year) in ranked]
+
+@views.route('/', methods=['GET', 'POST'])
+@conditional
 def index():
     '''
     Create index.html page and dropdown content.
@@ -542,169 +3750,184 @@ def index():
 
     Returns
     -------
-    index.html page, genre, title, rating, and country dropdown values.
+    index.html page, genre, rating, and country dropdown values. Movies for the radar chart are
+    picked with the /api/search typeahead instead of a dropdown of every title.
     '''
-    conn = sqlite3.connect('movie.db')
-    cur = conn.cursor()
+    cur = get_db().cursor()
     q_genre = '''
-    SELECT DISTINCT(genre) FROM movieInfo
+    SELECT genre FROM genreSummary WHERE genre IS NOT NULL ORDER BY genre
     '''
     cur.execute(q_genre)
     genres = ['None'] + [r[0] for r in cur.fetchall()]
 
-    q_title = '''
-    SELECT title FROM movieInfo ORDER BY title
-    '''
-    cur.execute(q_title)
-    titles = ['(choose a movie)'] + [res[0] for res in cur.fetchall()]
-
-    cur.execute(q_title)
-    titles2 = ['None'] + [res[0] for res in cur.fetchall()]
-
     q_rating = '''
-        SELECT DISTINCT(imdbRating) FROM movieInfo
+        SELECT imdbRating FROM ratingSummary WHERE imdbRating IS NOT NULL ORDER BY imdbRating
     '''
     cur.execute(q_rating)
     ratings = ['(select a rating)'] + [result[0] for result in cur.fetchall()]
 
     q_country = '''
-        SELECT DISTINCT(birthCountry) FROM director WHERE birthCountry != "No info" ORDER BY birthCountry
+        SELECT birthCountry FROM countrySummary WHERE birthCountry IS NOT NULL ORDER BY birthCountry
     '''
     cur.execute(q_country)
     countries = ['None'] + [rt[0] for rt in cur.fetchall()]
 
-    return render_template('index.html', genres=genres, titles=titles, ratings=ratings, countries=countries, titles2=titles2)
+    return render_template('index.html', genres=genres, ratings=ratings, countries=countries, compare_limit=COMPARE_LIMIT)
+
+@views.route('/api/search')
+@conditional
+def search_view():
+    '''
+    Typeahead search over movie titles and director names, e.g. /api/search?q=godfa&kind=movie&limit=5.
+
+    Parameters
+    ----------
+    None
 
-def get_top_movies(num=None, genre=None):
+    Returns
+    -------
+    JSON object with the query and its results from search_catalog
+    '''
+    query = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', SEARCH_LIMIT, type=int), 1), SEARCH_MAX_LIMIT)
+    kind = request.args.get('kind')
+    kinds = (kind,) if kind else ('movie', 'director')
+    return jsonify({'query': query, 'results': search_catalog(query, limit, kinds)})
+
+@dataset_cache
+def get_top_movies(num=None, genre=None, after=0, after_id=None):
     '''
-    Get the top X number of movies from the movie database and filter on genre.
+    Get one page of the top movies from the movie database in rank order, filtered on genre.
+    Movies without a listRank come last, in id order. Pages are read with a cursor on
+    (listRank, id) instead of an offset, so every page costs the same.
 
     Parameters
     ----------
     num: int
-        User inputted number for number of results they want.
+        Number of movies wanted on this page; at most PAGE_SIZE are returned.
     genre: str
-        User selected genre from dropdown for filtering by genre.
+        User selected genre from dropdown for filtering by genre, or None for all genres.
+    after: int
+        listRank of the last movie of the previous page (NULL_RANK if it had none), or 0 for the first page.
+    after_id: int
+        id of the last movie of the previous page, or None to start after every movie ranked after.
 
     Returns
     -------
     list of top movie query results for each title in top movie query, including listRank, title, releaseYear, genre, 
-    director name, worldwideGross, budget, imdbRating, and movie url
+    director name, worldwideGross, budget, imdbRating, movie url, and movie id
     '''
-    conn = sqlite3.connect('movie.db')
-    cur = conn.cursor()
-    limit_results = f"LIMIT {num}"
-    select = request.form.get('genres')
-    if select == 'None':
-        movie_genre = ''
-    elif select != 'None':
-        movie_genre = f'WHERE genre = "{select}"'
-    
-    query = f'''
-        SELECT listRank, title, releaseYear, genre, name, worldwideGross, budget, imdbRating, m.url
+    cur = get_db().cursor()
+    limit = min(int(num), PAGE_SIZE)
+    query = '''
+        SELECT listRank, title, releaseYear, genre, name, worldwideGross, budget, imdbRating, m.url, m.id
         FROM movieInfo m
-        JOIN director d
+        LEFT JOIN director d
         ON m.directorId = d.id
-        {movie_genre}
-        {limit_results}
+        WHERE {where}
+        ORDER BY listRank, m.id
+        LIMIT ?
     '''
-
-    top_movies = cur.execute(query).fetchall()
-    conn.close()
+    conditions = ['genre = ?'] if genre is not None else []
+    params = [genre] if genre is not None else []
+
+    top_movies = []
+    if after != NULL_RANK:
+        if after_id is None:
+            ranked = conditions + ['listRank > ?']
+            ranked_params = params + [after, limit]
+        else:
+            ranked = conditions + ['(listRank, m.id) > (?, ?)']
+            ranked_params = params + [after, after_id, limit]
+        top_movies = cur.execute(query.format(where=' AND '.join(ranked)), ranked_params).fetchall()
+        after_id = None
+    if len(top_movies) < limit:
+        unranked = conditions + ['listRank IS NULL', 'm.id > ?']
+        unranked_params = params + [after_id or 0, limit - len(top_movies)]
+        top_movies += cur.execute(query.format(where=' AND '.join(unranked)), unranked_params).fetchall()
     return top_movies
 
-#for visualization 2
-def get_boxoffice_values(title=None):
+def top_movies_cursor(row):
     '''
-    Get the box office numerical values for movies from the movie database.
+    Get the cursor of the page after a top movies row, see get_top_movies.
 
     Parameters
     ----------
-    title: str
-        User selected title for the title they want box office information on.
+    row: tuple
+        last row of a page of get_top_movies
 
     Returns
     -------
-    list of worldwideGross, grossUSA, and budget for a title.
-    '''
-    conn = sqlite3.connect('movie.db')
-    cur = conn.cursor()
-    title = request.form.get('titles')
-    movie_title = f'''WHERE title = "{title}"'''
-    query = f'''
-        SELECT worldwideGross, grossUSA, budget
-        FROM movieInfo
-        {movie_title}
+    tuple
+        listRank (NULL_RANK if it has none) and id of the movie
     '''
+    return (NULL_RANK if row[0] is None else row[0]), row[9]
 
-    cur.execute(query)
-    num_movie_info = [r for r in cur.fetchone()]
-    conn.close()
-    return num_movie_info
-
-def get_compare_boxoffice_values(title=None):
+#for visualization 2
+@dataset_cache
+def get_movies_info(movie_ids):
     '''
-    Get the box office numerical values for a movie from the movie database to compare with another movie.
+    Get the details and box office numbers of the movies to compare, with one query for all of them.
 
     Parameters
     ----------
-    title: str
-        User selected title for the title they want box office information on.
+    movie_ids: tuple
+        ids of the movies the user picked, from the /api/search typeahead.
 
     Returns
     -------
-    list of worldwideGross, grossUSA, and budget for a title.
+    list of listRank, title, releaseYear, director name, worldwideGross, grossUSA, budget, url, and id for each movie
+    that exists, in the order of movie_ids. The director name is None for a movie without a director.
     '''
-    conn = sqlite3.connect('movie.db')
-    cur = conn.cursor()
-    titles2 = request.form.get('titles2')
-    movie_title = f'''WHERE title = "{titles2}"'''
+    if not movie_ids:
+        return []
+    cur = get_db().cursor()
     query = f'''
-        SELECT worldwideGross, grossUSA, budget
-        FROM movieInfo
-        {movie_title}
+        SELECT listRank, title, releaseYear, d.name, worldwideGross, grossUSA, budget, m.url, m.id
+        FROM movieInfo m
+        LEFT JOIN director d
+        ON m.directorId = d.id
+        WHERE m.id IN ({', '.join('?' * len(movie_ids))})
     '''
+    rows = {row[8]: row for row in cur.execute(query, movie_ids)}
+    return [rows[movie_id] for movie_id in dict.fromkeys(movie_ids) if movie_id in rows]
 
-    cur.execute(query)
-    movie_info = [r for r in cur.fetchone()]
-    conn.close()
-    return movie_info
-
-def spec_movie_info(title=None):
+# for visualization 3
+def iter_ratings(rating=None):
     '''
-    Get the listRank, title, releaseYear, director name, worldwideGross, grossUSA, budget, and url for a movie title chosen by the user .
+    Iterate over the listRank, title, releaseYear, genre, runtimeMins, director name, worldwideGross, and budget
+    of movies with a user's chosen rating input, reading STREAM_CHUNK rows from the cursor at a time, so a
+    rating shared by many movies is never held in memory at once.
 
     Parameters
     ----------
-    title: str
-        User selected title for the title they want box office information on.
+    rating: float
+        User selected rating.
 
     Returns
     -------
-    list of listRank, title, releaseYear, d.name, worldwideGross, grossUSA, budget, and url for a movie title.
+    iterator of listRank, title, releaseYear, genre, runtimeMins, director name, worldwideGross, budget, and movie url for movies meeting the user's chosen IMDb rating.
+    Movies without a director or rank are included, with None for them, as in the catalog snapshot.
     '''
-
-    conn = sqlite3.connect('movie.db')
-    cur = conn.cursor()
-
-    movie_title = f'''WHERE title = "{title}"'''
-    query = f'''
-        SELECT listRank, title, releaseYear, d.name, worldwideGross, grossUSA, budget, m.url
+    cur = get_db().cursor()
+    query = '''
+        SELECT listRank, title, releaseYear, genre, runtimeMins, d.name, worldwideGross, budget, m.url
         FROM movieInfo m
-        JOIN director d
+        LEFT JOIN director d
         ON m.directorId = d.id
-        {movie_title}
+        WHERE imdbRating = ? AND budget IS NOT NULL AND worldwideGross IS NOT NULL
     '''
-
-    specific_movie = cur.execute(query).fetchall()
-    conn.close()
-    return specific_movie
-
-# for visualization 3
+    cur.execute(query, (db_real(rating),))
+    while True:
+        rows = cur.fetchmany(STREAM_CHUNK)
+        if not rows:
+            break
+        yield from rows
+
+@dataset_cache
 def get_ratings(rating=None):
     '''
-    Get the listRank, title, releaseYear, genre, runtimeMins, director name, worldwideGross, and budget 
-    of movies with a user's chosen rating input.
+    Get the movies with a user's chosen rating input, see iter_ratings.
 
     Parameters
     ----------
@@ -715,62 +3938,83 @@ def get_ratings(rating=None):
     -------
     list of listRank, title, releaseYear, genre, runtimeMins, director name, worldwideGross, budget, and movie url for movies meeting the user's chosen IMDb rating.
     '''
+    return list(iter_ratings(rating))
 
-    conn = sqlite3.connect('movie.db')
-    cur = conn.cursor()
-    rating = request.form.get('ratings')
-    movie_rating = f'''WHERE imdbRating = "{rating}"'''
-    query = f'''
-        SELECT listRank, title, releaseYear, genre, runtimeMins, d.name, worldwideGross, budget, m.url
-        FROM movieInfo m
-        JOIN director d
-        ON m.directorId = d.id
-        {movie_rating} AND budget != "No info" AND worldwideGross != "No info"
-    '''
-    rating_info = cur.execute(query).fetchall()
-    conn.close()
-    return rating_info
-
-def get_top_directors(num=None, country=None):
+@dataset_cache
+def get_top_directors(num=None, country=None, after=None):
     '''
-    Get a list of top X number of directors based on user input with birth country as a filter.
+    Get one page of the top directors by number of directing credits, with birth country as a filter.
+    Directors with the same number of credits are ordered by id, and directors without credits come
+    last. Pages are read with a cursor on (directorCredits, id) instead of an offset, so every page costs the same.
 
     Parameters
     ----------
     num: int
-        User inputted number for top X value.
+        Number of directors wanted on this page; at most PAGE_SIZE are returned.
     country: str
-        User selected birth country to filter results.
+        User selected birth country to filter results, or None for all countries.
+    after: tuple
+        (directorCredits, id) of the last director of the previous page, with NULL_CREDITS if it had
+        no credits, or None for the first page.
 
     Returns
     -------
-    list of name, birthYear, birthCountry, trademark, directorCredits, url for directors meeting the user's inputs.
+    list of name, birthYear, birthCountry, trademark, directorCredits, url, id for directors meeting the user's inputs.
     '''
-    conn = sqlite3.connect('movie.db')
-    cur = conn.cursor()
-    limit_results = f"LIMIT {num}"
-    select = request.form.get('countries')
-    if select == 'None':
-        d_country = ''
-    elif select != 'None':
-        d_country = f'WHERE birthCountry = "{select}"'
-    
-    query = f'''
-        SELECT name, birthYear, birthCountry, trademark, directorCredits, url
+    cur = get_db().cursor()
+    limit = min(int(num), PAGE_SIZE)
+    query = '''
+        SELECT name, birthYear, birthCountry, trademark, directorCredits, url, id
         FROM director
-        {d_country}
-        ORDER BY directorCredits DESC
-        {limit_results}
+        WHERE {where}
+        ORDER BY directorCredits DESC, id DESC
+        LIMIT ?
     '''
-
-    top_directors = cur.execute(query).fetchall()
-    conn.close()
+    conditions = ['birthCountry = ?'] if country is not None else []
+    params = [country] if country is not None else []
+
+    top_directors = []
+    if after is None or after[0] != NULL_CREDITS:
+        if after is None:
+            credited = conditions + ['directorCredits IS NOT NULL']
+            credited_params = params + [limit]
+        else:
+            credited = conditions + ['(directorCredits, id) < (?, ?)']
+            credited_params = params + list(after) + [limit]
+        top_directors = cur.execute(query.format(where=' AND '.join(credited)), credited_params).fetchall()
+        after = None
+    if len(top_directors) < limit:
+        uncredited = conditions + ['directorCredits IS NULL']
+        uncredited_params = list(params)
+        if after is not None:
+            uncredited.append('id < ?')
+            uncredited_params.append(after[1])
+        uncredited_params.append(limit - len(top_directors))
+        top_directors += cur.execute(query.format(where=' AND '.join(uncredited)), uncredited_params).fetchall()
     return top_directors
 
-@app.route('/top_movies', methods=['GET', 'POST'])
+def top_directors_cursor(row):
+    '''
+    Get the cursor of the page after a top directors row, see get_top_directors.
+
+    Parameters
+    ----------
+    row: tuple
+        last row of a page of get_top_directors
+
+    Returns
+    -------
+    tuple
+        directorCredits (NULL_CREDITS if it has none) and id of the director
+    '''
+    return (NULL_CREDITS if row[4] is None else row[4]), row[6]
+
+@views.route('/top_movies', methods=['GET', 'POST'])
+@conditional
 def table_view():
     '''
-    Create top_movies.html page and use user inputted values to get a table of top X movies.
+    Create top_movies.html page and use user inputted values to get a table of top X movies, PAGE_SIZE
+    movies per page. The next page is requested with a GET carrying the cursor of this page.
 
     Parameters
     ----------
@@ -778,45 +4022,36 @@ def table_view():
 
     Returns
     -------
-    top_movies page, results (list of top movies), user inputted number, user inputted genre, and value for number of rows in your search result.
+    top_movies page, results (list of top movies on this page), user inputted number, user inputted genre, value for number of rows in your search result,
+    position of the first movie on this page, and the form values of the next page (None on the last page).
     '''
-    num = request.form['rank']
-    genre = request.form.get('genres')
+    num = request.values['rank']
+    genre = request.values.get('genres')
     if genre == 'None':
         genre = None
-    results = get_top_movies(num=num, genre=genre)
-
-    conn = sqlite3.connect('movie.db')
-    cur = conn.cursor()
+    # cursor of the page: rank and id of the last movie shown so far, and how many were shown
+    after = request.values.get('after', 0, type=int)
+    after_id = request.values.get('after_id', type=int)
+    shown = request.values.get('shown', 0, type=int)
 
-    select = request.form.get('genres')
-
-    if select == 'None':
-        movie_genre = ''
-    elif select != 'None':
-        movie_genre = f'WHERE genre = "{select}"'
-    limit_results = f"LIMIT {num}"
-
-    query_rows = f'''
-        SELECT COUNT(*)
-        FROM (
-            SELECT * 
-            FROM movieInfo
-            {movie_genre}
-            {limit_results}
-        )
-    '''
+    row_count = count_rows('genreSummary', genre, limit=int(num))
+    results = get_top_movies(num=max(row_count - shown, 0), genre=genre, after=after, after_id=after_id)
 
-    result = cur.execute(query_rows).fetchone()
-    row_count = result[0]
+    next_page = None
+    if results and shown + len(results) < row_count:
+        after, after_id = top_movies_cursor(results[-1])
+        next_page = {'rank': num, 'genres': request.values.get('genres'), 'after': after, 'after_id': after_id,
+                     'shown': shown + len(results)}
 
-    return render_template('top_movies.html', results=results, num=num, genre=genre, row_count=row_count)
+    return stream_page('top_movies.html', results=results, num=num, genre=genre, row_count=row_count,
+                       first=shown + 1, next_page=next_page)
 
 # Visualization 2: Radar plots to compare movies across different dimensions.
-@app.route('/radar_chart', methods=['GET', 'POST'])
+@views.route('/radar_chart', methods=['GET', 'POST'])
+@conditional
 def get_radar_chart():
     '''
-    Create a radar plot for one or two movies depending on user input of movie titles.
+    Create a radar plot comparing the box office numbers of up to COMPARE_LIMIT movies picked by the user.
 
     Parameters
     ----------
@@ -824,63 +4059,32 @@ def get_radar_chart():
 
     Returns
     -------
-    radar_chart.html page, movie titles, radar_plot, list of search results (results, comp_result) for tables
+    radar_chart.html page, movie titles, radar_plot, list of movie details (results) for the table
     '''
-    conn = sqlite3.connect('movie.db')
-    cur = conn.cursor()
-
-    #Get header row from table
-    cur.execute("SELECT * FROM movieInfo")
-    head = [tuple[0] for tuple in cur.description]
-    boxoffice_header = []
-    boxoffice_header.append(head[6])
-    boxoffice_header.append(head[7])
-    boxoffice_header.append(head[8])
-
-    movie_title = request.form.get('titles')
-
-    comp_title = request.form.get('titles2')
-
-    #Plot radar chart depending on user input
-    r = get_boxoffice_values(title=movie_title)
-    theta = boxoffice_header
-
-    if comp_title != 'None':
-        r2 = get_compare_boxoffice_values(title=comp_title)
-        theta = boxoffice_header
-
-    if comp_title == 'None':
-        data = [go.Scatterpolar(name=movie_title,
-        r = r, theta = theta, fill = 'toself', line = dict(color = '#F5C518'))]
-
-        fig = go.Figure(data=data)
-        radar_plot = fig.to_html(full_html=False)
-    elif comp_title == movie_title:
-        data = [go.Scatterpolar(name=movie_title,
-        r = r, theta = theta, fill = 'toself', line = dict(color = '#F5C518'))]
-
-        fig = go.Figure(data=data)
-        radar_plot = fig.to_html(full_html=False)
-    else: 
-        data = [go.Scatterpolar(name=movie_title,
-        r = r, theta = theta, fill = 'toself', line = dict(color = '#F5C518'), ),
-        go.Scatterpolar(name=comp_title,
-        r = r2, theta = theta, fill = 'toself', line = dict(color = '#1848f5'))
-        ]
+    #Box office column names of the movieInfo table
+    boxoffice_header = ['worldwideGross', 'grossUSA', 'budget']
 
-        fig = go.Figure(data=data)
-        radar_plot = fig.to_html(full_html=False)
+    #Movie ids picked with the /api/search typeahead, as repeated movie values; movie2 is the
+    #second movie of the older two-movie form
+    movie_ids = request.values.getlist('movie', type=int) + request.values.getlist('movie2', type=int)
+    movie_ids = tuple(dict.fromkeys(movie_ids))[:COMPARE_LIMIT]
 
-    #tables
-    movie_title = request.form.get('titles')
-    results = spec_movie_info(title=movie_title)
+    results = get_movies_info(movie_ids)
+    if not results:
+        # no movie was picked
+        return index()
+    titles = [row[1] for row in results]
 
-    comp_result = spec_movie_info(title=comp_title)
+    #Plot radar chart with one outline per movie
+    colors = [BOXOFFICE_COLORS['gross'], BOXOFFICE_COLORS['budget']] + CHART_COLORS
+    movies = [(row[1], list(row[4:7]), colors[i % len(colors)]) for i, row in enumerate(results)]
+    radar_plot = chart_html(radar_chart(movies, boxoffice_header))
 
-    return render_template('radar_chart.html', title=movie_title, boxoffice_url=radar_plot, results=results, comp_result=comp_result, comp_title=comp_title)
+    return render_template('radar_chart.html', titles=titles, boxoffice_url=radar_plot, results=results)
 
 #Visualization 3: view ratings table and scatterplot
-@app.route('/ratings', methods=['GET', 'POST'])
+@views.route('/ratings', methods=['GET', 'POST'])
+@conditional
 def rating_view():
     '''
     Create a table view and bar plot based on user input of IMDb Rating. Bar plot will show budget and worldwide gross against rank in original top 250 list.
@@ -895,61 +4099,36 @@ def rating_view():
     'ratings.html' page, list of rank, worldwide Gross, budget, and titles for movies of a chosen IMDb Rating, user inputted rating, # of results returned from user input, 
     list of ranks resulting from user input, list of worldwide gross resulting from user input, bar plot)
     '''
-    #ratings table
-    rating = request.form.get('ratings')
+    #ratings table, streamed from the cursor as the page is sent
+    rating = request.values.get('ratings')
 
-    results = get_ratings(rating=rating)
+    results = iter_ratings(rating=rating)
 
-    conn = sqlite3.connect('movie.db')
-    cur = conn.cursor()
-    rating = request.form.get('ratings')
-    movie_rating = f'''WHERE imdbRating = "{rating}"'''
-    
-    query_rows = f'''
-        SELECT COUNT(*)
-        FROM movieInfo
-        {movie_rating}
-    '''
-
-    result = cur.execute(query_rows).fetchone()
-    row_count = result[0]
-
-    query_trg = f'''
-        SELECT listRank, worldwideGross, budget, title
-        FROM movieInfo
-        {movie_rating} AND budget != "No info" AND worldwideGross != "No info"
-    '''
-
-    #bar plot to compare budget and worldwide gross against rank.
-    cur.execute(query_trg)
-    rank_list = [result[0] for result in cur.fetchall()]
-    cur.execute(query_trg)
-    gross_list = [result[1] for result  in cur.fetchall()]
-    cur.execute(query_trg)
-    budget_list = [result[2] for result  in cur.fetchall()]
-    cur.execute(query_trg)
-    title_list = [result[3] for result  in cur.fetchall()]
-    conn.close()
-
-
-    d = {'title': title_list, 'gross': gross_list, 'rank': rank_list, 'budget': budget_list}
-    df = pd.DataFrame(data=d)
+    row_count = count_rows('ratingSummary', rating)
 
-    fig = px.bar(df, x = 'rank', y = ['budget', 'gross'], hover_name= 'title', color_discrete_map={
-        'budget': '#1848f5',
-        'gross': '#F5C518'
-    })
-    fig.update_layout(xaxis_title="Rank", yaxis_title="Amount in USD")
-    bar_plot = fig.to_html(full_html=False)
+    #bar plot to compare budget and worldwide gross against rank, from the columns of the catalog snapshot;
+    #unranked movies have no bar to draw
+    snapshot = get_snapshot()
+    if db_real(rating) is None:
+        mask = np.zeros(snapshot['size'], dtype=bool)
+    else:
+        mask = snapshot_mask(snapshot, present=('listRank', 'budget', 'worldwideGross'), imdbRating=db_real(rating))
+    columns = snapshot_select(snapshot, ('listRank', 'worldwideGross', 'budget', 'title'), mask)
+    rank_list = columns['listRank'].astype(int).tolist()
+    gross_list = columns['worldwideGross'].astype(int).tolist()
+    budget_list = columns['budget'].astype(int).tolist()
+    bar_plot = chart_html(rating_chart(rank_list, columns['title'].tolist(), gross_list, budget_list))
 
-    return render_template('ratings.html', results=results, rating=rating, row_count=row_count, rlist=rank_list, glist=gross_list, url=bar_plot)
+    return stream_page('ratings.html', results=results, rating=rating, row_count=row_count, rlist=rank_list, glist=gross_list, url=bar_plot)
 
 #Visualization 4
-@app.route('/directors', methods=['GET', 'POST'])
+@views.route('/directors', methods=['GET', 'POST'])
+@conditional
 def director_view():
     '''
     Create a table view and bar plot based on user input of top X directors (from the top 250 list of movies) based on the number of their directing credits. Bar plot shows the number of directing credits a director has and from which country they are from.
     The table view gives more information about the directors that fall in the user's chosen number of results and country filter.
+    Both show PAGE_SIZE directors per page; the next page is requested with a GET carrying the cursor of this page.
 
     Parameters
     ----------
@@ -957,69 +4136,343 @@ def director_view():
 
     Returns
     -------
-    'directors.html' page, list of directors and information about them, user's chosen number of results, actual number of returned results, country user chooses, bar plot to show # of directing credits for directors)
+    'directors.html' page, list of directors on this page and information about them, user's chosen number of results, actual number of returned results, country user chooses, bar plot to show # of directing credits for directors,
+    position of the first director on this page, and the form values of the next page (None on the last page))
     '''
-    num = request.form['d_rank']
-    country = request.form.get('c')
+    num = request.values['d_rank']
+    country = request.values.get('countries')
     if country == 'None':
         country = None
-    results = get_top_directors(num=num, country=country)
+    # cursor of the page: credits and id of the last director shown so far, and how many were shown
+    after_id = request.values.get('after_id', type=int)
+    after = (request.values.get('after_credits', type=int), after_id) if after_id is not None else None
+    shown = request.values.get('shown', 0, type=int)
+
+    row_count = count_rows('countrySummary', country, limit=int(num))
+    results = get_top_directors(num=max(row_count - shown, 0), country=country, after=after)
+
+    next_page = None
+    if results and shown + len(results) < row_count:
+        after_credits, after_id = top_directors_cursor(results[-1])
+        next_page = {'d_rank': num, 'countries': request.values.get('countries'), 'after_credits': after_credits,
+                     'after_id': after_id, 'shown': shown + len(results)}
+
+    #bar plot of the directors on this page
+    name_list = [result[0] for result in results]
+    credit_list = [result[4] for result in results]
+    country_list = [result[2] for result in results]
+
+    url = chart_html(director_chart(name_list, credit_list, country_list))
+
+    return stream_page('directors.html', results=results, num=num, country=country, row_count=row_count, url=url,
+                       first=shown + 1, next_page=next_page)
+
+# JSON API: the data of the four visualizations, for dashboards and scripts
+# Column names of the rows returned by the data functions
+TOP_MOVIE_COLUMNS = ('listRank', 'title', 'releaseYear', 'genre', 'director', 'worldwideGross', 'budget', 'imdbRating', 'url', 'id')
+MOVIE_INFO_COLUMNS = ('listRank', 'title', 'releaseYear', 'director', 'worldwideGross', 'grossUSA', 'budget', 'url', 'id')
+RATING_COLUMNS = ('listRank', 'title', 'releaseYear', 'genre', 'runtimeMins', 'director', 'worldwideGross', 'budget', 'url')
+DIRECTOR_COLUMNS = ('name', 'birthYear', 'birthCountry', 'trademark', 'directorCredits', 'url', 'id')
+
+def api_param(args, name, convert=str, default=None):
+    '''
+    Read a typed query parameter of an API call.
 
-    conn = sqlite3.connect('movie.db')
-    cur = conn.cursor()
+    Parameters
+    ----------
+    args: MultiDict
+        parameters of the call
+    name: str
+        name of the parameter
+    convert: function
+        type of the parameter, e.g. int
+    default:
+        value when the parameter is missing or empty
 
-    select = request.form.get('countries')
+    Returns
+    -------
+    the converted value
 
-    if select == 'None':
-        d_country = ''
-    elif select != 'None':
-        d_country = f'WHERE birthCountry = "{select}"'
-    limit_results = f"LIMIT {num}"
+    Raises
+    ------
+    ValueError
+        if the value does not convert
+    '''
+    value = args.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        return convert(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be of type {convert.__name__}, got {value!r}')
 
-    query_rows = f'''
-        SELECT COUNT(*)
-        FROM (
-            SELECT * 
-            FROM director
-            {d_country}
-            {limit_results}
-        )
+def api_rows(columns, rows):
     '''
-    result = cur.execute(query_rows).fetchone()
-    row_count = result[0]
+    Turn query rows into JSON objects.
 
-    query_credit = f'''
-        SELECT name, directorCredits, birthCountry
-        FROM director
-        {d_country}
-        {limit_results}
+    Parameters
+    ----------
+    columns: tuple
+        column names of the rows
+    rows: list
+        query rows
+
+    Returns
+    -------
+    list
+        one dict per row
     '''
+    return [dict(zip(columns, row)) for row in rows]
 
-    cur.execute(query_credit)
-    name_list = [result[0] for result in cur.fetchall()]
-    cur.execute(query_credit)
-    credit_list = [result[1] for result in cur.fetchall()]
-    cur.execute(query_credit)
-    country_list = [result[2] for result in cur.fetchall()]
-    conn.close()
+def api_top_movies(args):
+    '''
+    Top movies in rank order, e.g. /api/v1/top_movies?genre=Drama&num=10. Pages hold at most
+    PAGE_SIZE movies; the next page is requested with the after value in "next".
+
+    Parameters
+    ----------
+    args: MultiDict
+        num (int, default PAGE_SIZE), genre (str, default all genres), after and after_id (int,
+        listRank and id of the last movie of the previous page, see get_top_movies)
+
+    Returns
+    -------
+    dict
+        total number of matching movies, the movies of this page, and the parameters of the next page or None
+    '''
+    num = api_param(args, 'num', int, PAGE_SIZE)
+    genre = api_param(args, 'genre')
+    after = api_param(args, 'after', int, 0)
+    after_id = api_param(args, 'after_id', int)
+    if num < 0 or after < 0:
+        raise ValueError('num and after must not be negative')
+
+    total = count_rows('genreSummary', genre)
+    results = get_top_movies(num=num, genre=genre, after=after, after_id=after_id)
+    next_page = None
+    if num > PAGE_SIZE and len(results) == PAGE_SIZE:
+        after, after_id = top_movies_cursor(results[-1])
+        next_page = {'num': num - PAGE_SIZE, 'genre': genre, 'after': after, 'after_id': after_id}
+    return {'total': total, 'results': api_rows(TOP_MOVIE_COLUMNS, results), 'next': next_page}
+
+def api_boxoffice(args):
+    '''
+    Box office values and details of movies to compare, e.g. /api/v1/boxoffice?movie=12&movie=40.
+
+    Parameters
+    ----------
+    args: MultiDict
+        movie (int, repeated): ids of up to COMPARE_LIMIT movies, from /api/search
+
+    Returns
+    -------
+    dict
+        one result per movie that exists, in the order asked
+    '''
+    try:
+        movie_ids = [int(value) for value in args.getlist('movie')]
+    except (TypeError, ValueError):
+        raise ValueError(f"movie must be of type int, got {args.getlist('movie')!r}")
+    if not movie_ids:
+        raise ValueError('movie is required')
+    if len(movie_ids) > COMPARE_LIMIT:
+        raise ValueError(f'at most {COMPARE_LIMIT} movies can be compared')
+
+    return {'results': api_rows(MOVIE_INFO_COLUMNS, get_movies_info(tuple(movie_ids)))}
+
+def api_ratings(args):
+    '''
+    Movies with an IMDb rating, and known budget and gross, e.g. /api/v1/ratings?rating=8.5.
+
+    Parameters
+    ----------
+    args: MultiDict
+        rating (float, required)
 
+    Returns
+    -------
+    dict
+        number of movies with the rating, and the movies with known budget and gross
+    '''
+    rating = api_param(args, 'rating', float)
+    if rating is None:
+        raise ValueError('rating is required')
+    return {'total': count_rows('ratingSummary', rating), 'results': api_rows(RATING_COLUMNS, get_ratings(rating=rating))}
+
+def api_directors(args):
+    '''
+    Top directors by directing credits, e.g. /api/v1/directors?country=England&num=10. Pages hold
+    at most PAGE_SIZE directors; the next page is requested with the after values in "next".
+
+    Parameters
+    ----------
+    args: MultiDict
+        num (int, default PAGE_SIZE), country (str, default all countries), after_credits and
+        after_id (int, directorCredits and id of the last director of the previous page, see get_top_directors)
+
+    Returns
+    -------
+    dict
+        total number of matching directors, the directors of this page, and the parameters of the next page or None
+    '''
+    num = api_param(args, 'num', int, PAGE_SIZE)
+    country = api_param(args, 'country')
+    after_credits = api_param(args, 'after_credits', int)
+    after_id = api_param(args, 'after_id', int)
+    if num < 0:
+        raise ValueError('num must not be negative')
+    if (after_credits is None) != (after_id is None):
+        raise ValueError('after_credits and after_id go together')
+    after = (after_credits, after_id) if after_id is not None else None
+
+    total = count_rows('countrySummary', country)
+    results = get_top_directors(num=num, country=country, after=after)
+    next_page = None
+    if num > PAGE_SIZE and len(results) == PAGE_SIZE:
+        after_credits, after_id = top_directors_cursor(results[-1])
+        next_page = {'num': num - PAGE_SIZE, 'country': country, 'after_credits': after_credits, 'after_id': after_id}
+    return {'total': total, 'results': api_rows(DIRECTOR_COLUMNS, results), 'next': next_page}
+
+# Queries of the JSON API by name, each taking its parameters and returning a JSON object
+API_QUERIES = {
+    'top_movies': api_top_movies,
+    'boxoffice': api_boxoffice,
+    'ratings': api_ratings,
+    'directors': api_directors,
+}
+
+def run_api_query(name, args):
+    '''
+    Answer one API query.
+
+    Parameters
+    ----------
+    name: str
+        name of the query in API_QUERIES
+    args: MultiDict
+        parameters of the query
+
+    Returns
+    -------
+    tuple
+        (JSON object, HTTP status)
+    '''
+    if name not in API_QUERIES:
+        return {'error': f'unknown query {name!r}'}, 404
+    try:
+        return API_QUERIES[name](args), 200
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+@views.route('/api/v1/<name>')
+@conditional
+def api_view(name):
+    '''
+    Answer one query of the JSON API, e.g. /api/v1/top_movies?genre=Drama&num=10.
+
+    Parameters
+    ----------
+    name: str
+        name of the query: top_movies, boxoffice, ratings or directors
+
+    Returns
+    -------
+    JSON object of the query, or {"error": ...} with status 400 or 404
+    '''
+    data, status = run_api_query(name, request.args)
+    return jsonify(data), status
 
-    d = {'name': name_list, 'credits': credit_list, 'country': country_list}
-    df = pd.DataFrame(data=d)
+@views.route('/api/v1/batch', methods=['GET', 'POST'])
+@conditional
+def api_batch_view():
+    '''
+    Answer many queries of the JSON API in one round-trip. Queries are either repeated q
+    parameters holding a query with its parameters, e.g.
+    /api/v1/batch?q=ratings?rating=8.5&q=top_movies?genre=Drama (with the inner query strings
+    URL-encoded), or a POSTed JSON body such as
+    {"queries": [{"query": "ratings", "rating": 8.5}, {"query": "boxoffice", "movie": [12, 40]}]}.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    JSON object {"results": [...]}, with a {"status": ..., "data" or "error": ...} per query in order
+    '''
+    if request.is_json:
+        body = request.get_json(silent=True)
+        queries = body.get('queries') if isinstance(body, dict) else None
+        if not isinstance(queries, list) or not all(isinstance(query, dict) for query in queries):
+            return jsonify({'error': 'the body must be {"queries": [{"query": name, ...parameters}, ...]}'}), 400
+        queries = [(query.get('query'), MultiDict({key: value for key, value in query.items() if key != 'query'}))
+                   for query in queries]
+    else:
+        queries = []
+        for query in request.values.getlist('q'):
+            name, _, query_string = query.partition('?')
+            queries.append((name, MultiDict(parse_qsl(query_string))))
+    if len(queries) > BATCH_LIMIT:
+        return jsonify({'error': f'at most {BATCH_LIMIT} queries per batch'}), 400
+
+    results = []
+    for name, args in queries:
+        data, status = run_api_query(name, args)
+        if status == 200:
+            results.append({'status': status, 'data': data})
+        else:
+            results.append({'status': status, 'error': data['error']})
+    return jsonify({'results': results})
+
+@views.after_app_request
+def compress_response(response):
+    '''
+    Compress HTML pages and other text responses with brotli or gzip when the browser accepts
+    it. Streamed pages are compressed chunk by chunk with gzip. Files sent from disk are left
+    alone; the fingerprinted assets have precompressed variants.
 
-    #scatterplot
-    fig = px.bar(df, x = 'name', y = 'credits', color='country')
-    fig.update_layout(xaxis_title="Director Name", yaxis_title="# of Directing Credits")
-    url = fig.to_html(full_html=False)
+    Parameters
+    ----------
+    response
+        webpage response
 
-    return render_template('directors.html', results=results, num=num, country=country, row_count=row_count, url=url)
+    Returns
+    -------
+    response
+    '''
+    if (response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESS_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    if response.is_streamed:
+        if not request.accept_encodings['gzip']:
+            return response
+        response.response = gzip_stream(response.response)
+        response.headers['Content-Encoding'] = 'gzip'
+    elif len(response.get_data()) < COMPRESS_MIN_BYTES:
+        return response
+    elif brotli is not None and request.accept_encodings['br']:
+        response.set_data(brotli.compress(response.get_data(), quality=5))
+        response.headers['Content-Encoding'] = 'br'
+    elif request.accept_encodings['gzip']:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        return response
 
+    etag, weak = response.get_etag()
+    if etag is not None and not weak:
+        response.set_etag(etag, weak=True)
+    return response
 
 #reload pages to make sure plots update
-@app.after_request
+@views.after_app_request
 def add_header(response):
     '''
     Control cache so that it doesn't store a cache so plots and charts can stay up to date as users change their inputs for results.
+    Responses with an ETag (the conditional views and static files) are left alone, since the
+    browser revalidates them and gets a new copy as soon as the data changes.
 
     Parameters
     ----------
@@ -1030,37 +4483,93 @@ def add_header(response):
     -------
     response
     '''
+    if response.get_etag()[0] is not None:
+        return response
     response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, post-check=0, pre-check=0, max-age=0'
     response.headers['Pragma'] = 'no-cache'
     response.headers['Expires'] = '-1'
     return response
 
-if __name__ == "__main__":
-    CACHE_DICT = open_cache()
-    movie_dict = build_movie_url_dict()
-
-    rankings = get_rankings_dict()
-
-    # movies = []
-    # directors = []
+##### COMMAND LINE #####
 
-    # for mov_url in movie_dict.values():
-    #     movie_instance = get_movie_info(mov_url)
-    #     movies.append(movie_instance)
-    #     director_dict = build_director_url_dict(mov_url)
-    #     for val in director_dict.values():
-    #         director_instance = get_director_info(val)
-    #         if director_instance not in directors:
-    #             directors.append(director_instance)
-    # write_csv('movie_info.csv', movies)
-    # write_csv('directors.csv', directors)
+def main(argv=None):
+    '''
+    Run one of the commands of the project. Only crawl touches IMDb or the scrape cache; serve
+    reads the movie database and nothing else.
 
-    # create_db()
-    # update_director_table()
-    # update_movie_table()
+        $ python3 final_project.py crawl [--refresh]
+        $ python3 final_project.py build-db [--movies movie_info.csv --directors directors.csv] [--migrate]
+        $ python3 final_project.py serve [--port 5000] [--debug]
+        $ python3 final_project.py bench [scraper_bench.py arguments]
 
-    print('starting Flask app', app.name)
-    app.run(debug=True)
+    Without a command, serve is run.
 
+    Parameters
+    ----------
+    argv: list
+        command line arguments, sys.argv[1:] if None
 
+    Returns
+    -------
+    None
+    '''
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Scrape IMDb's top English movies and serve visualizations of them.")
+    commands = parser.add_subparsers(dest='command')
+
+    crawl_parser = commands.add_parser('crawl', help='crawl IMDb into a new movie database and the csv files')
+    crawl_parser.add_argument('--refresh', action='store_true',
+                              help='only scrape pages that changed, and upsert them into the existing database')
+    crawl_parser.add_argument('--concurrency', type=int, default=CRAWL_CONCURRENCY, help='pages fetched at the same time')
+
+    build_parser = commands.add_parser('build-db', help='build the movie database from csv, Parquet or Arrow files')
+    build_parser.add_argument('--movies', default='movie_info.csv', help='movie file; .csv, .parquet or Arrow IPC')
+    build_parser.add_argument('--directors', default='directors.csv', help='director file of the same format')
+    build_parser.add_argument('--migrate', action='store_true',
+                              help='only migrate the existing database to the current schema')
+
+    serve_parser = commands.add_parser('serve', help="serve the pages with Flask's development server")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=5000)
+    serve_parser.add_argument('--debug', action='store_true', help="turn on Flask's debugger and reloader")
+
+    commands.add_parser('bench', help='run scraper_bench.py; the other arguments are passed to it', add_help=False)
+
+    # the arguments after bench belong to scraper_bench.py
+    args, bench_args = parser.parse_known_args(argv)
+    command = args.command or 'serve'
+    if bench_args and command != 'bench':
+        parser.error('unrecognized arguments: ' + ' '.join(bench_args))
+
+    if command == 'crawl':
+        evict_cache(max_bytes=CACHE_MAX_BYTES, max_age=CACHE_MAX_AGE)
+        if args.refresh:
+            migrate_db()
+            print(refresh_crawl(args.concurrency))
+        else:
+            create_db()
+            print(stream_to_db(iter_crawl(args.concurrency), movie_csv='movie_info.csv', director_csv='directors.csv'))
+
+    elif command == 'build-db':
+        if args.migrate:
+            migrate_db()
+        else:
+            create_db()
+            if args.movies.endswith('.csv'):
+                print(load_csv_files(args.movies, args.directors))
+            else:
+                print(load_arrow_files(args.movies, args.directors))
+
+    elif command == 'serve':
+        migrate_db()
+        app = create_app({'DEBUG': getattr(args, 'debug', False)})
+        print('starting Flask app', app.name)
+        app.run(host=getattr(args, 'host', '127.0.0.1'), port=getattr(args, 'port', 5000))
+
+    elif command == 'bench':
+        import scraper_bench
+        scraper_bench.main(bench_args)
 
+if __name__ == "__main__":
+    main()
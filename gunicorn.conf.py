@@ -0,0 +1,21 @@
+'''
+Production serving of the web app with gunicorn, several worker processes sharing the read-only
+movie database:
+
+    $ gunicorn -c gunicorn.conf.py 'final_project:create_app()'
+
+Settings can be changed on the command line, e.g. --workers 4 --bind 0.0.0.0:8000.
+'''
+
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '127.0.0.1:8000')
+
+# The pages are CPU-bound Python, so one worker process per core; each worker runs two
+# threads to overlap database reads and slow clients
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = 2
+
+# Make the app, and warm its caches, once in the parent process before the workers are forked
+preload_app = True
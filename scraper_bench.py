@@ -0,0 +1,1217 @@
+'''
+Offline benchmarks for the IMDb scrapers in final_project.py.
+
+Builds a synthetic corpus of list, movie and director pages in the markup shape the
+scrapers read, at any size, and measures the scrapers on it without touching imdb.com.
+
+    $ python3 scraper_bench.py --sweep
+    $ python3 scraper_bench.py --titles 250 1000 10000
+    $ python3 scraper_bench.py --titles 1000 --backend lxml
+    $ python3 scraper_bench.py --titles 1000 --crawl
+    $ python3 scraper_bench.py --titles 250 --refresh
+    $ python3 scraper_bench.py --load 1000000
+    $ python3 scraper_bench.py --load 1000000 --load-format parquet
+    $ python3 scraper_bench.py --snapshot 1000000
+    $ python3 scraper_bench.py --serve 1 2 4
+    $ python3 scraper_bench.py --startup
+    $ python3 scraper_bench.py --charts 250 5000
+    $ python3 scraper_bench.py --compare 100000
+    $ python3 scraper_bench.py --stream 30000 300000
+'''
+
+import argparse
+import contextlib
+import http.client
+import http.server
+import io
+import json
+import multiprocessing
+import os
+import random
+import resource
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import final_project
+
+GENRES = ['Drama', 'Crime', 'Action', 'Adventure', 'Biography', 'Comedy', 'Animation', 'Western']
+COUNTRIES = ['USA', 'UK', 'France', 'Canada', 'Australia', 'New Zealand', 'Germany', 'Japan']
+
+# Corpus sizes of the scraper benchmark run by --sweep
+SWEEP_TITLES = [250, 1000, 10000, 100000]
+
+# Markup that the scrapers never read, repeated to bring pages near the size of real IMDb pages
+FILLER = (
+    '<div class="article"><ul class="ipc-inline-list">'
+    + '<li role="presentation"><a class="ipc-link" href="/chart/">Menu item</a></li>' * 20
+    + '</ul><p>Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p></div>'
+)
+
+##### BUILD THE CORPUS #####
+
+def movie_path(i):
+    '''
+    Path of the synthetic movie page for title number i.
+
+    Parameters
+    ----------
+    i: int
+        Title number, starting at 1.
+
+    Returns
+    -------
+    string
+        path of the movie page, e.g. '/title/tt0000001/'
+    '''
+    return f'/title/tt{i:07d}/'
+
+def director_path(d):
+    '''
+    Path of the synthetic director page for director number d.
+
+    Parameters
+    ----------
+    d: int
+        Director number, starting at 0.
+
+    Returns
+    -------
+    string
+        path of the director page, e.g. '/name/nm0000001/'
+    '''
+    return f'/name/nm{d:07d}/'
+
+def director_of(i, n_titles):
+    '''
+    Director number of title number i. About one director per three titles, like the real list.
+
+    Parameters
+    ----------
+    i: int
+        Title number.
+    n_titles: int
+        Number of titles in the corpus.
+
+    Returns
+    -------
+    int
+        director number
+    '''
+    return (i * 7919) % max(1, n_titles // 3)
+
+def make_chart_html(n_titles):
+    '''
+    Build the list page for a corpus of n_titles movies.
+
+    Parameters
+    ----------
+    n_titles: int
+        Number of titles on the list.
+
+    Returns
+    -------
+    string
+        HTML in the shape of "https://www.imdb.com/chart/top-english-movies"
+    '''
+    rows = []
+    for i in range(1, n_titles + 1):
+        rows.append(
+            '<tr>'
+            f'<td class="posterColumn"><span name="rk" data-value="{i}"></span>'
+            f'<a href="{movie_path(i)}"><img src="/poster.jpg" alt="Movie {i}"></a></td>'
+            f'<td class="titleColumn">{i}.\n<a href="{movie_path(i)}" title="Director {director_of(i, n_titles)}">Movie {i}</a>'
+            f'<span class="secondaryInfo">({1920 + i % 100})</span></td>'
+            f'<td class="ratingColumn imdbRating"><strong>{7 + (i % 30) / 10}</strong></td>'
+            '</tr>'
+        )
+    return (
+        '<!DOCTYPE html><html><head><title>Top Rated English Movies</title></head><body>'
+        + FILLER
+        + '<div class="lister"><table class="chart full-width"><tbody class="lister-list">'
+        + ''.join(rows)
+        + '</tbody></table></div>'
+        + FILLER
+        + '</body></html>'
+    )
+
+def make_movie_html(i, n_titles, filler=20):
+    '''
+    Build the movie page for title number i. Every fifth title has no box office numbers
+    and every seventh has a budget in another currency, to exercise the "No info" paths.
+
+    Parameters
+    ----------
+    i: int
+        Title number.
+    n_titles: int
+        Number of titles in the corpus.
+    filler: int
+        Number of unread filler blocks to pad the page with.
+
+    Returns
+    -------
+    string
+        HTML in the shape of an IMDb movie page
+    '''
+    rng = random.Random(i)
+    d = director_of(i, n_titles)
+    budget = rng.randrange(1, 200) * 1000000
+    box_office = ''
+    if i % 5:
+        currency = '€' if i % 7 == 0 else '$'
+        box_office = (
+            '<div class="txt-block"><h4 class="inline">Budget:</h4>'
+            f'{currency}{budget:,}\n<span class="attribute">(estimated)</span></div>'
+            '<div class="txt-block"><h4 class="inline">Opening Weekend USA:</h4> $1,000,000</div>'
+            '<div class="txt-block"><h4 class="inline">Gross USA:</h4> '
+            f'${budget * 2:,}</div>'
+            '<div class="txt-block"><h4 class="inline">Cumulative Worldwide Gross:</h4> '
+            f'${budget * 3:,}</div>'
+        )
+    return (
+        '<!DOCTYPE html><html><head><title>Movie</title></head><body>'
+        + FILLER * (filler // 2)
+        + '<div class="title_bar_wrapper"><div class="ratings_wrapper"><div class="ratingValue">'
+        f'<strong><span itemprop="ratingValue">{7 + (i % 30) / 10}</span></strong></div></div>'
+        '<div class="title_wrapper">'
+        f'<h1 class="">Movie {i}&nbsp;<span id="titleYear">(<a href="/year/{1920 + i % 100}/">{1920 + i % 100}</a>)</span> </h1>'
+        f'<div class="subtext">PG-13 | <time>2h 22min</time> | <a href="/genre">{GENRES[i % len(GENRES)]}</a></div>'
+        '</div></div>'
+        '<div class="plot_summary"><div class="summary_text">A synthetic plot.</div>'
+        f'<div class="credit_summary_item"><h4 class="inline">Director:</h4><a href="{director_path(d)}">director {d}</a></div>'
+        '<div class="credit_summary_item"><h4 class="inline">Writer:</h4><a href="/name/nm9999999/">A Writer</a></div>'
+        '</div>'
+        + FILLER * (filler - filler // 2)
+        + '<div class="article" id="titleDetails"><h3>Box Office</h3>'
+        + box_office
+        + '<h3>Technical Specs</h3>'
+        f'<div class="txt-block"><h4 class="inline">Runtime:</h4><time>{80 + i % 100} min</time></div>'
+        '<div class="txt-block"><h4 class="inline">Color:</h4><a href="/color">Color</a></div>'
+        '</div></body></html>'
+    )
+
+def make_director_html(d, filler=20):
+    '''
+    Build the director page for director number d. Every eleventh director has no trademark.
+
+    Parameters
+    ----------
+    d: int
+        Director number.
+    filler: int
+        Number of unread filler blocks to pad the page with.
+
+    Returns
+    -------
+    string
+        HTML in the shape of an IMDb director page
+    '''
+    trademark = ''
+    if d % 11:
+        trademark = f'<div id="dyk-trademark" class="txt-block"><h4>Trademark:</h4> Long takes number {d} <a href="/tm">See more</a> &raquo;</div>'
+    return (
+        '<!DOCTYPE html><html><head><title>Director</title></head><body>'
+        + FILLER * (filler // 2)
+        + '<table id="name-overview-widget-layout"><tr><td class="article name-overview">'
+        '<div class="name-overview-widget"><h1 class="header"><span class="itemprop">'
+        f'Director {d}</span></h1></div></td></tr></table>'
+        '<div id="name-born-info" class="txt-block"><h4 class="inline">Born:</h4>'
+        f'<time><a href="/born">May 1</a>, <a href="/year">{1900 + d % 90}</a></time> in '
+        f'<a href="/place">Town, State, {COUNTRIES[d % len(COUNTRIES)]}</a></div>'
+        + trademark
+        + FILLER * (filler - filler // 2)
+        + '<div id="filmography"><div class="head" id="filmo-head-director">'
+        f'<a name="director">Director</a> ({5 + d % 40} credits)\n</div></div>'
+        '</body></html>'
+    )
+
+def iter_corpus(n_titles, filler=20):
+    '''
+    Generate the corpus one page at a time, so corpora of any size fit in memory.
+
+    Parameters
+    ----------
+    n_titles: int
+        Number of titles on the list.
+    filler: int
+        Number of unread filler blocks per movie and director page.
+
+    Returns
+    -------
+    generator
+        (kind, path, html) tuples where kind is 'chart', 'movie' or 'director'
+    '''
+    yield 'chart', '/chart/top-english-movies', make_chart_html(n_titles)
+    for i in range(1, n_titles + 1):
+        yield 'movie', movie_path(i), make_movie_html(i, n_titles, filler)
+    for d in range(max(1, n_titles // 3)):
+        yield 'director', director_path(d), make_director_html(d, filler)
+
+##### MEASURE #####
+
+def peak_rss_mb():
+    '''
+    Peak resident set size of this process so far.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    float
+        peak RSS in MB
+    '''
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes and macOS bytes
+    if sys.platform == 'darwin':
+        return peak / 1024 / 1024
+    return peak / 1024
+
+def bench_parsing(n_titles, backend=None, partial=None, filler=20, sample=500):
+    '''
+    Measure the scrapers on a synthetic corpus: pages per second for each page type and
+    time per field extractor on movie pages.
+
+    Parameters
+    ----------
+    n_titles: int
+        Number of titles on the list.
+    backend: string
+        BeautifulSoup parser name. Uses final_project.PARSER_BACKEND if None.
+    partial: bool
+        Whether to parse only the parts that are read. Uses final_project.PARTIAL_PARSING if None.
+    filler: int
+        Number of unread filler blocks per movie and director page.
+    sample: int
+        Largest number of movie and director pages to time; the rest are skipped to keep
+        big corpora quick. The list page is always parsed in full.
+
+    Returns
+    -------
+    dict
+        timings for the corpus
+    '''
+    results = {'titles': n_titles}
+    seconds = {'chart': 0.0, 'movie': 0.0, 'director': 0.0}
+    pages = {'chart': 0, 'movie': 0, 'director': 0}
+    page_bytes = {'chart': 0, 'movie': 0, 'director': 0}
+
+    fields = {
+        'soup': lambda html: final_project.make_soup(html, final_project.MOVIE_STRAINER, backend, partial),
+        'title': final_project.extract_title,
+        'release_genre': final_project.extract_release_genre,
+        'director_link': final_project.extract_director_link,
+        'box_office': final_project.extract_box_office,
+        'rating': final_project.extract_rating,
+    }
+    field_seconds = dict.fromkeys(fields, 0.0)
+
+    for kind, path, html in iter_corpus(n_titles, filler):
+        if kind != 'chart' and pages[kind] >= sample:
+            continue
+        url = final_project.BASEURL + path
+
+        start = time.perf_counter()
+        if kind == 'chart':
+            chart = final_project.parse_chart_html(html, backend, partial)
+            assert len(chart['rankings']) == n_titles
+        elif kind == 'movie':
+            final_project.parse_movie_html(html, backend, partial)
+        else:
+            final_project.parse_director_html(html, url, backend, partial)
+        seconds[kind] += time.perf_counter() - start
+        pages[kind] += 1
+        page_bytes[kind] += len(html)
+
+        if kind == 'movie':
+            start = time.perf_counter()
+            soup = fields['soup'](html)
+            field_seconds['soup'] += time.perf_counter() - start
+            for name, extractor in fields.items():
+                if name != 'soup':
+                    start = time.perf_counter()
+                    extractor(soup)
+                    field_seconds[name] += time.perf_counter() - start
+
+    for kind in seconds:
+        results[kind + '_pages'] = pages[kind]
+        results[kind + '_kb_per_page'] = page_bytes[kind] / pages[kind] / 1024
+        results[kind + '_pages_per_sec'] = pages[kind] / seconds[kind]
+    for name in fields:
+        results['field_' + name + '_ms'] = field_seconds[name] / pages['movie'] * 1000
+    results['peak_rss_mb'] = peak_rss_mb()
+    return results
+
+class CorpusHandler(http.server.BaseHTTPRequestHandler):
+    '''
+    Serves the synthetic corpus over HTTP, building each page when it is requested. Pages carry
+    an ETag and a Last-Modified header, and a conditional request for an unchanged page gets a
+    304. Set listed to put fewer titles on the list page, and edited to change the pages of
+    those title numbers. The status of every response is counted in statuses.
+    '''
+    n_titles = 250
+    filler = 20
+    listed = None
+    edited = frozenset()
+    last_modified = 'Mon, 01 Mar 2021 00:00:00 GMT'
+    statuses = None
+    lock = threading.Lock()
+
+    def do_GET(self):
+        path = self.path
+        if path.startswith('/chart/'):
+            html = make_chart_html(self.n_titles if self.listed is None else self.listed)
+        elif path.startswith('/title/tt') and int(path[9:16]) <= self.n_titles:
+            i = int(path[9:16])
+            html = make_movie_html(i, self.n_titles, self.filler)
+            if i in self.edited:
+                html = html.replace('A synthetic plot.', 'A revised synthetic plot.')
+        elif path.startswith('/name/nm'):
+            html = make_director_html(int(path[8:15]), self.filler)
+        else:
+            self.count(404)
+            self.send_error(404)
+            return
+        body = html.encode('utf-8')
+        etag = '"' + final_project.hash_html(html) + '"'
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match == etag or (if_none_match is None
+                                     and self.headers.get('If-Modified-Since') == self.last_modified):
+            self.count(304)
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.count(200)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', self.last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def count(self, status):
+        '''Count a response in statuses, if the server keeps counts.'''
+        if self.statuses is not None:
+            with self.lock:
+                self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def log_message(self, format, *args):
+        pass
+
+def bench_crawl(n_titles, concurrency=final_project.CRAWL_CONCURRENCY, filler=20):
+    '''
+    Run a cold and a warm crawl of a synthetic corpus served from a local HTTP server,
+    with a fresh scrape cache in a temporary folder.
+
+    Parameters
+    ----------
+    n_titles: int
+        Number of titles on the list.
+    concurrency: int
+        Number of pages fetched at the same time.
+    filler: int
+        Number of unread filler blocks per movie and director page.
+
+    Returns
+    -------
+    dict
+        timings for the crawls
+    '''
+    handler = type('Handler', (CorpusHandler,), {'n_titles': n_titles, 'filler': filler})
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    saved = (final_project.BASEURL, final_project.CHART_URL, final_project.CRAWL_RATE, os.getcwd())
+    tmp = tempfile.TemporaryDirectory()
+    try:
+        # the cache store is opened relative to the working folder
+        final_project.close_cache()
+        os.chdir(tmp.name)
+        final_project.BASEURL = f'http://127.0.0.1:{server.server_address[1]}'
+        final_project.CHART_URL = final_project.BASEURL + '/chart/top-english-movies'
+        # the local server needs no politeness limit
+        final_project.CRAWL_RATE = 1e9
+
+        results = {'titles': n_titles}
+        for run in ('cold', 'warm'):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                movies, directors = final_project.crawl(concurrency)
+            elapsed = time.perf_counter() - start
+            results[run + '_seconds'] = elapsed
+            results[run + '_pages_per_sec'] = (1 + len(movies) + len(directors)) / elapsed
+        results['peak_rss_mb'] = peak_rss_mb()
+    finally:
+        final_project.BASEURL, final_project.CHART_URL, final_project.CRAWL_RATE, cwd = saved
+        final_project.close_cache()
+        os.chdir(cwd)
+        server.shutdown()
+        server.server_close()
+        tmp.cleanup()
+    return results
+
+def expect(name, got, want):
+    '''
+    Check one outcome of a benchmark run.
+
+    Parameters
+    ----------
+    name: str
+        what is checked
+    got:
+        the outcome
+    want:
+        the expected outcome
+
+    Returns
+    -------
+    None
+    '''
+    if got != want:
+        raise AssertionError(f'{name}: expected {want!r}, got {got!r}')
+
+def bench_refresh(n_titles, concurrency=final_project.CRAWL_CONCURRENCY, filler=20):
+    '''
+    Crawl a synthetic corpus served from a local HTTP server into a new movie database, then
+    time refresh_crawl against it and check what it did: with every page still fresh, with
+    every page revalidated and unchanged (304s), with a tenth of the movie pages changed,
+    and with the last tenth of the titles dropped from the list. A page the server answers
+    with a 404 must not be cached. Raises AssertionError if any outcome is wrong.
+
+    Parameters
+    ----------
+    n_titles: int
+        Number of titles on the list.
+    concurrency: int
+        Number of pages fetched at the same time.
+    filler: int
+        Number of unread filler blocks per movie and director page.
+
+    Returns
+    -------
+    dict
+        seconds taken by each refresh
+    '''
+    statuses = {}
+    handler = type('Handler', (CorpusHandler,), {'n_titles': n_titles, 'filler': filler, 'statuses': statuses})
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    saved = (final_project.BASEURL, final_project.CHART_URL, final_project.CRAWL_RATE, final_project.CACHE_TTLS,
+             os.getcwd())
+    tmp = tempfile.TemporaryDirectory()
+    try:
+        # the cache store and the movie database are opened relative to the working folder
+        final_project.close_cache()
+        os.chdir(tmp.name)
+        final_project.BASEURL = f'http://127.0.0.1:{server.server_address[1]}'
+        final_project.CHART_URL = final_project.BASEURL + '/chart/top-english-movies'
+        final_project.CRAWL_RATE = 1e9
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            movies, directors = final_project.crawl(concurrency)
+            final_project.create_db()
+            final_project.bulk_load(movies, directors)
+        n_pages = 1 + len(movies) + len(directors)
+        n_edited = max(1, n_titles // 10)
+        results = {'titles': n_titles}
+
+        def refresh(name):
+            statuses.clear()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                counts = final_project.refresh_crawl(concurrency)
+            results[name + '_seconds'] = time.perf_counter() - start
+            return counts, dict(statuses)
+
+        expect('fresh refresh', refresh('fresh'), ({'movies': 0, 'directors': 0, 'unranked': 0}, {}))
+
+        final_project.CACHE_TTLS = dict.fromkeys(final_project.CACHE_TTLS, 0)
+        expect('unchanged refresh', refresh('unchanged'),
+               ({'movies': 0, 'directors': 0, 'unranked': 0}, {304: n_pages}))
+
+        handler.edited = frozenset(range(1, 10 * n_edited + 1, 10))
+        expect('changed refresh', refresh('changed'),
+               ({'movies': n_edited, 'directors': 0, 'unranked': 0}, {200: n_edited, 304: n_pages - n_edited}))
+
+        handler.listed = n_titles - n_edited
+        expect('relisted refresh', refresh('relisted')[0],
+               {'movies': n_titles - n_edited, 'directors': 0, 'unranked': n_edited})
+        conn = sqlite3.connect(final_project.DB_FILENAME)
+        expect('unranked movies', conn.execute('SELECT COUNT(*) FROM movieInfo WHERE listRank IS NULL').fetchone()[0],
+               n_edited)
+        expect('shared ranks', conn.execute('''
+            SELECT COUNT(*)
+            FROM (SELECT listRank FROM movieInfo WHERE listRank IS NOT NULL GROUP BY listRank HAVING COUNT(*) > 1)
+        ''').fetchone()[0], 0)
+        conn.close()
+
+        missing = final_project.BASEURL + movie_path(n_titles + 1)
+        expect('missing page', final_project.refresh_page(missing), (None, False))
+        expect('missing page cached', final_project.cache_get(missing), None)
+    finally:
+        final_project.BASEURL, final_project.CHART_URL, final_project.CRAWL_RATE, final_project.CACHE_TTLS, cwd = saved
+        final_project.close_cache()
+        os.chdir(cwd)
+        server.shutdown()
+        server.server_close()
+        tmp.cleanup()
+    return results
+
+def iter_movie_records(n_titles):
+    '''
+    Generate movie information dictionaries like the scrapers return, without building pages.
+
+    Parameters
+    ----------
+    n_titles: int
+        Number of movies.
+
+    Returns
+    -------
+    generator
+        movie information dictionaries
+    '''
+    for i in range(1, n_titles + 1):
+        budget = (i * 7919) % 200 * 1000000
+        yield {
+            'title': f'Movie {i}',
+            'releaseYear': str(1920 + i % 100),
+            'runtimeMins': str(80 + i % 100),
+            'genre': GENRES[i % len(GENRES)],
+            'director': f'Director {director_of(i, n_titles)}',
+            'worldwideGross': "No info" if i % 5 == 0 else str(budget * 3),
+            'grossUSA': "No info" if i % 5 == 0 else str(budget * 2),
+            'budget': "No info" if i % 5 == 0 or i % 7 == 0 else str(budget),
+            'imdbRating': str(7 + (i % 30) / 10),
+            'listRank': str(i),
+            'url': final_project.BASEURL + movie_path(i),
+        }
+
+def iter_director_records(n_titles):
+    '''
+    Generate director information dictionaries like the scrapers return, without building pages.
+
+    Parameters
+    ----------
+    n_titles: int
+        Number of movies; there is one director per three movies.
+
+    Returns
+    -------
+    generator
+        director information dictionaries
+    '''
+    for d in range(max(1, n_titles // 3)):
+        yield {
+            'name': f'Director {d}',
+            'birthYear': str(1900 + d % 90),
+            'birthCountry': COUNTRIES[d % len(COUNTRIES)],
+            'trademark': "No info" if d % 11 == 0 else f'Long takes number {d}',
+            'directorCredits': str(5 + d % 40),
+            'url': final_project.BASEURL + director_path(d),
+        }
+
+def bench_load(n_titles, file_format=None):
+    '''
+    Bulk load a synthetic dataset into a new movie database in a temporary folder.
+
+    Parameters
+    ----------
+    n_titles: int
+        Number of movies; there is one director per three movies.
+    file_format: str
+        None to load the records straight from memory, or 'csv', 'parquet' or 'arrow' to
+        write them to files first and time the load from those files.
+
+    Returns
+    -------
+    dict
+        the load report from final_project.bulk_load, plus rows per second and peak RSS
+    '''
+    cwd = os.getcwd()
+    tmp = tempfile.TemporaryDirectory()
+    try:
+        os.chdir(tmp.name)
+        final_project.create_db()
+        movie_file = f'movie_info.{file_format}'
+        director_file = f'directors.{file_format}'
+        if file_format == 'csv':
+            final_project.write_csv(movie_file, list(iter_movie_records(n_titles)))
+            final_project.write_csv(director_file, list(iter_director_records(n_titles)))
+        elif file_format:
+            final_project.write_arrow(movie_file, list(iter_movie_records(n_titles)), 'movie')
+            final_project.write_arrow(director_file, list(iter_director_records(n_titles)), 'director')
+        with contextlib.redirect_stdout(io.StringIO()):
+            if file_format == 'csv':
+                results = final_project.load_csv_files(movie_file, director_file)
+            elif file_format:
+                results = final_project.load_arrow_files(movie_file, director_file)
+            else:
+                results = final_project.bulk_load(iter_movie_records(n_titles), iter_director_records(n_titles))
+        results['rows_per_sec'] = (results['movies'] + results['directors']) / results['seconds']
+        results['peak_rss_mb'] = peak_rss_mb()
+    finally:
+        os.chdir(cwd)
+        tmp.cleanup()
+    return results
+
+def time_call(function, repeat):
+    '''
+    Time a function call.
+
+    Parameters
+    ----------
+    function: callable
+        function to call without arguments
+    repeat: int
+        number of calls
+
+    Returns
+    -------
+    float
+        mean microseconds per call
+    '''
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def bench_snapshot(n_titles, repeat=20):
+    '''
+    Load a synthetic dataset into a new movie database, then time loading the columnar snapshot
+    and a few analyses on it against the same analyses in SQL.
+
+    Parameters
+    ----------
+    n_titles: int
+        Number of movies; there is one director per three movies.
+    repeat: int
+        Number of times each analysis is run.
+
+    Returns
+    -------
+    dict
+        snapshot load seconds and microseconds per analysis, from the snapshot and from SQL
+    '''
+    fp = final_project
+    cwd = os.getcwd()
+    tmp = tempfile.TemporaryDirectory()
+    try:
+        os.chdir(tmp.name)
+        fp.create_db()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fp.bulk_load(iter_movie_records(n_titles), iter_director_records(n_titles))
+
+        start = time.perf_counter()
+        snapshot = fp.load_snapshot()
+        results = {'load_seconds': time.perf_counter() - start}
+
+        def ratio_by_genre():
+            mask = fp.snapshot_mask(snapshot, present=('budget', 'worldwideGross'))
+            gross = fp.snapshot_group(snapshot, 'genre', 'worldwideGross', mask=mask)
+            budget = fp.snapshot_group(snapshot, 'genre', 'budget', mask=mask)
+            return {genre: gross[genre] / budget[genre] for genre in gross if budget[genre]}
+
+        analyses = {
+            'ratio_by_genre': (ratio_by_genre, '''
+                SELECT genre, SUM(worldwideGross) * 1.0 / SUM(budget) FROM movieInfo
+                WHERE budget IS NOT NULL AND worldwideGross IS NOT NULL GROUP BY genre'''),
+            'rating_histogram': (lambda: fp.snapshot_histogram(snapshot, 'imdbRating', bins=20), '''
+                SELECT CAST(imdbRating * 2 AS INTEGER), COUNT(*) FROM movieInfo GROUP BY 1'''),
+            'gross_per_country': (lambda: fp.snapshot_group(snapshot, 'birthCountry', 'worldwideGross'), '''
+                SELECT birthCountry, SUM(worldwideGross) FROM movieInfo m JOIN director d
+                ON m.directorId = d.id GROUP BY birthCountry'''),
+        }
+        conn = fp.get_db()
+        for name, (function, query) in analyses.items():
+            results[f'{name}_us'] = time_call(function, repeat)
+            results[f'{name}_sql_us'] = time_call(lambda: conn.execute(query).fetchall(), repeat)
+        results['peak_rss_mb'] = peak_rss_mb()
+    finally:
+        fp.close_db()
+        os.chdir(cwd)
+        tmp.cleanup()
+    return results
+
+def peak_allocated_kb(function):
+    '''
+    Measure the most memory allocated at once during a function call.
+
+    Parameters
+    ----------
+    function: callable
+        function to call without arguments
+
+    Returns
+    -------
+    float
+        peak KB allocated during the call
+    '''
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+def bench_charts(n_points, repeat=20):
+    '''
+    Time building the ratings and directors bar charts from n_points rows, with the chart specs
+    of final_project.py against pandas and plotly.express, as the pages used to.
+
+    Parameters
+    ----------
+    n_points: int
+        number of bars in each chart
+    repeat: int
+        number of times each chart is built
+
+    Returns
+    -------
+    dict
+        microseconds and peak KB allocated per chart, for both ways of building it
+    '''
+    import pandas as pd
+    import plotly.express as px
+
+    fp = final_project
+    rng = random.Random(n_points)
+    ranks = list(range(1, n_points + 1))
+    titles = [f'Movie {i}' for i in ranks]
+    gross = [rng.randrange(10**6, 10**9) for _ in ranks]
+    budget = [rng.randrange(10**5, 10**8) for _ in ranks]
+    names = [f'Director {i}' for i in ranks]
+    credits = [rng.randrange(1, 200) for _ in ranks]
+    countries = [rng.choice(COUNTRIES) for _ in ranks]
+
+    def rating_express():
+        df = pd.DataFrame(data={'title': titles, 'gross': gross, 'rank': ranks, 'budget': budget})
+        fig = px.bar(df, x='rank', y=['budget', 'gross'], hover_name='title',
+                     color_discrete_map={'budget': '#1848f5', 'gross': '#F5C518'})
+        fig.update_layout(xaxis_title="Rank", yaxis_title="Amount in USD")
+        return fig.to_html(full_html=False, include_plotlyjs=False)
+
+    def director_express():
+        df = pd.DataFrame(data={'name': names, 'credits': credits, 'country': countries})
+        fig = px.bar(df, x='name', y='credits', color='country')
+        fig.update_layout(xaxis_title="Director Name", yaxis_title="# of Directing Credits")
+        return fig.to_html(full_html=False, include_plotlyjs=False)
+
+    charts = {
+        'rating_spec': lambda: fp.chart_html(fp.rating_chart(ranks, titles, gross, budget)),
+        'rating_express': rating_express,
+        'director_spec': lambda: fp.chart_html(fp.director_chart(names, credits, countries)),
+        'director_express': director_express,
+    }
+    results = {'points': n_points}
+    for name, function in charts.items():
+        # the first call loads the chart theme and plotly's modules
+        function()
+        results[f'{name}_us'] = time_call(function, repeat)
+        results[f'{name}_peak_kb'] = peak_allocated_kb(function)
+    return results
+
+def bench_compare(n_titles, sizes=(1, 2, 5, 10, 20), repeat=50):
+    '''
+    Load a synthetic dataset into a new movie database, then time the radar chart page and its
+    query for growing numbers of compared movies. The movies are picked at random for every
+    request, so no cache answers them. The batched query is timed against fetching the movies
+    one query at a time, as the page did for its two movies before.
+
+    Parameters
+    ----------
+    n_titles: int
+        Number of movies; there is one director per three movies.
+    sizes: tuple
+        numbers of movies to compare
+    repeat: int
+        Number of requests per size.
+
+    Returns
+    -------
+    dict
+        milliseconds per page, and microseconds per batched and per one-at-a-time fetch, by size
+    '''
+    fp = final_project
+    rng = random.Random(n_titles)
+    tmp = tempfile.TemporaryDirectory()
+    cwd = os.getcwd()
+    try:
+        os.chdir(tmp.name)
+        fp.create_db()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fp.bulk_load(iter_movie_records(n_titles), iter_director_records(n_titles))
+        app = fp.create_app({'DB_FILENAME': os.path.join(tmp.name, fp.DB_FILENAME), 'BUILD_ASSETS': False})
+        client = app.test_client()
+        one_query = '''
+            SELECT listRank, title, releaseYear, d.name, worldwideGross, grossUSA, budget, m.url, m.id
+            FROM movieInfo m JOIN director d ON m.directorId = d.id WHERE m.id = ?'''
+
+        results = {'titles': n_titles}
+        for size in sizes:
+            picks = [rng.sample(range(1, n_titles + 1), size) for _ in range(repeat)]
+            start = time.perf_counter()
+            for movie_ids in picks:
+                response = client.get('/radar_chart?' + '&'.join(f'movie={movie_id}' for movie_id in movie_ids))
+                assert response.status_code == 200
+            results[f'page_{size}_ms'] = (time.perf_counter() - start) / repeat * 1000
+
+            with app.app_context():
+                conn = fp.get_db()
+                picks = iter([tuple(rng.sample(range(1, n_titles + 1), size)) for _ in range(repeat)])
+                results[f'batched_{size}_us'] = time_call(lambda: fp.get_movies_info.__wrapped__(next(picks)), repeat)
+                picks = iter([rng.sample(range(1, n_titles + 1), size) for _ in range(repeat)])
+                results[f'one_by_one_{size}_us'] = time_call(
+                    lambda: [conn.execute(one_query, (movie_id,)).fetchall() for movie_id in next(picks)], repeat)
+    finally:
+        fp.close_db()
+        fp.close_db_pool()
+        os.chdir(cwd)
+        tmp.cleanup()
+    return results
+
+def bench_stream(n_titles, rating='8.4'):
+    '''
+    Load a synthetic dataset into a new movie database, then time the ratings page for one
+    rating, shared by a thirtieth of the movies: streamed from the cursor as the app sends it,
+    and rendered in one piece from all rows, as it was before.
+
+    Parameters
+    ----------
+    n_titles: int
+        Number of movies; there is one director per three movies.
+    rating: str
+        rating to show
+
+    Returns
+    -------
+    dict
+        rows shown, and milliseconds to the first byte and to the whole page and peak KB
+        allocated, for both ways of rendering
+    '''
+    fp = final_project
+    tmp = tempfile.TemporaryDirectory()
+    cwd = os.getcwd()
+    try:
+        os.chdir(tmp.name)
+        fp.create_db()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fp.bulk_load(iter_movie_records(n_titles), iter_director_records(n_titles))
+        app = fp.create_app({'DB_FILENAME': os.path.join(tmp.name, fp.DB_FILENAME), 'BUILD_ASSETS': False})
+        client = app.test_client()
+        url = f'/ratings?ratings={rating}'
+
+        def streamed():
+            start = time.perf_counter()
+            first = None
+            response = client.get(url, buffered=False)
+            for chunk in response.response:
+                if first is None:
+                    first = time.perf_counter() - start
+            response.close()
+            return first, time.perf_counter() - start
+
+        def rendered():
+            start = time.perf_counter()
+            with app.test_request_context(url):
+                results = fp.get_ratings.__wrapped__(rating=rating)
+                snapshot = fp.get_snapshot()
+                mask = fp.snapshot_mask(snapshot, present=('listRank', 'budget', 'worldwideGross'),
+                                        imdbRating=float(rating))
+                columns = fp.snapshot_select(snapshot, ('listRank', 'worldwideGross', 'budget', 'title'), mask)
+                chart = fp.chart_html(fp.rating_chart(columns['listRank'].astype(int).tolist(), columns['title'].tolist(),
+                                                      columns['worldwideGross'].astype(int).tolist(),
+                                                      columns['budget'].astype(int).tolist()))
+                html = fp.render_template('ratings.html', results=results, rating=rating, row_count=len(results), url=chart)
+            elapsed = time.perf_counter() - start
+            return elapsed, elapsed, len(html)
+
+        results = {'titles': n_titles}
+        with app.app_context():
+            results['rows'] = fp.count_rows('ratingSummary', float(rating))
+        for name, function in (('streamed', streamed), ('rendered', rendered)):
+            # the first call loads the snapshot
+            function()
+            first, total = function()[:2]
+            results[f'{name}_first_byte_ms'] = first * 1000
+            results[f'{name}_total_ms'] = total * 1000
+            results[f'{name}_peak_kb'] = peak_allocated_kb(function)
+    finally:
+        fp.close_db()
+        fp.close_db_pool()
+        os.chdir(cwd)
+        tmp.cleanup()
+    return results
+
+# Pages requested by the serving load test, in turn
+SERVE_PATHS = [
+    '/',
+    '/top_movies?rank=50&genres=None',
+    '/ratings?ratings=8.5',
+    '/directors?d_rank=20&countries=None',
+    '/radar_chart?movie=1&movie2=2',
+    '/api/v1/top_movies?num=10&genre=Drama',
+]
+
+def load_client(port, seconds, queue):
+    '''
+    Request SERVE_PATHS in turn over one keep-alive connection for some seconds, and put the
+    latencies of the requests on a queue. Runs in its own process, so the clients do not
+    share the GIL.
+
+    Parameters
+    ----------
+    port: int
+        port of the server on 127.0.0.1
+    seconds: float
+        how long to send requests
+    queue: multiprocessing.Queue
+        receives the list of latencies in seconds
+
+    Returns
+    -------
+    None
+    '''
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    latencies = []
+    end = time.perf_counter() + seconds
+    i = 0
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        conn.request('GET', SERVE_PATHS[i % len(SERVE_PATHS)])
+        response = conn.getresponse()
+        response.read()
+        if response.status != 200:
+            raise RuntimeError(f'{SERVE_PATHS[i % len(SERVE_PATHS)]} answered {response.status}')
+        latencies.append(time.perf_counter() - start)
+        i += 1
+    conn.close()
+    queue.put(latencies)
+
+def bench_serve(workers, clients=None, seconds=10):
+    '''
+    Start the web app under gunicorn in production mode (gunicorn.conf.py) on the movie database
+    in the working folder, and time a load test of the pages against it.
+
+    Parameters
+    ----------
+    workers: int
+        number of gunicorn worker processes
+    clients: int
+        number of client processes sending requests, by default two per worker
+    seconds: float
+        length of the load test
+
+    Returns
+    -------
+    dict
+        requests per second and latency percentiles
+    '''
+    clients = clients or 2 * workers
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    here = os.path.dirname(os.path.abspath(__file__))
+    server = subprocess.Popen(
+        ['gunicorn', '-c', os.path.join(here, 'gunicorn.conf.py'), '--workers', str(workers),
+         '--bind', f'127.0.0.1:{port}', '--chdir', here, 'final_project:create_app()'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        # wait until the workers answer
+        deadline = time.perf_counter() + 60
+        while True:
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port)
+                conn.request('GET', '/')
+                conn.getresponse().read()
+                conn.close()
+                break
+            except OSError:
+                if time.perf_counter() > deadline or server.poll() is not None:
+                    raise RuntimeError('gunicorn did not start')
+                time.sleep(0.2)
+
+        queue = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=load_client, args=(port, seconds, queue)) for _ in range(clients)]
+        for process in processes:
+            process.start()
+        latencies = sorted(latency for _ in processes for latency in queue.get())
+        for process in processes:
+            process.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {'workers': workers, 'clients': clients, 'requests': len(latencies),
+            'requests_per_sec': len(latencies) / seconds,
+            'p50_ms': latencies[len(latencies) // 2] * 1000,
+            'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000}
+
+# Libraries that serving the pages should never import
+SCRAPE_MODULES = ['bs4', 'requests', 'pandas', 'plotly.express', 'plotly.graph_objs', 'pyarrow']
+
+# Run in a new interpreter: import the app, make it, and report what that took and loaded
+STARTUP_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import final_project
+imported = time.perf_counter()
+final_project.create_app()
+print(json.dumps({'import_seconds': imported - start, 'create_app_seconds': time.perf_counter() - imported,
+                  'loaded': [m for m in sys.argv[1:] if m in sys.modules]}))
+'''
+
+def bench_startup(repeat=5):
+    '''
+    Time how long the web app takes to start: importing the module and making the app in a new
+    interpreter, and running final_project.py serve until it answers its first request. Uses the
+    movie database next to final_project.py.
+
+    Parameters
+    ----------
+    repeat: int
+        number of starts; the median of each timing is reported
+
+    Returns
+    -------
+    dict
+        median seconds to import, to make the app and to the first answered request, and the
+        scraping and charting libraries that were imported by starting the app
+    '''
+    here = os.path.dirname(os.path.abspath(__file__))
+    timings = {'import_seconds': [], 'create_app_seconds': [], 'first_request_seconds': []}
+    loaded = set()
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT] + SCRAPE_MODULES, cwd=here,
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.splitlines()[-1])
+        timings['import_seconds'].append(result['import_seconds'])
+        timings['create_app_seconds'].append(result['create_app_seconds'])
+        loaded.update(result['loaded'])
+
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        start = time.perf_counter()
+        server = subprocess.Popen([sys.executable, 'final_project.py', 'serve', '--port', str(port)], cwd=here,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            while True:
+                try:
+                    conn = http.client.HTTPConnection('127.0.0.1', port)
+                    conn.request('GET', '/')
+                    status = conn.getresponse().status
+                    conn.close()
+                    if status == 200:
+                        break
+                except OSError:
+                    if server.poll() is not None or time.perf_counter() - start > 60:
+                        raise RuntimeError('final_project.py serve did not start')
+                    time.sleep(0.01)
+            timings['first_request_seconds'].append(time.perf_counter() - start)
+        finally:
+            server.terminate()
+            server.wait()
+
+    results = {name: sorted(values)[len(values) // 2] for name, values in timings.items()}
+    results['scrape_modules_loaded'] = ', '.join(sorted(loaded)) or 'none'
+    return results
+
+def print_results(results):
+    '''
+    Print one benchmark result as aligned name/value lines.
+
+    Parameters
+    ----------
+    results: dict
+        Result from bench_parsing or bench_crawl.
+
+    Returns
+    -------
+    None
+    '''
+    for name, value in results.items():
+        if isinstance(value, float):
+            value = f'{value:,.3f}'
+        print(f'  {name:<28} {value}')
+    print()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the IMDb scrapers on a synthetic corpus.')
+    parser.add_argument('--titles', type=int, nargs='*', default=[],
+                        help='corpus sizes to benchmark the scrapers on')
+    parser.add_argument('--sweep', action='store_true',
+                        help=f'benchmark the scrapers on every corpus size in {SWEEP_TITLES}')
+    parser.add_argument('--backend', default=None, help='BeautifulSoup parser, e.g. lxml')
+    parser.add_argument('--full', action='store_true', help='turn partial parsing off')
+    parser.add_argument('--filler', type=int, default=20, help='unread filler blocks per page')
+    parser.add_argument('--sample', type=int, default=500, help='movie and director pages to time per size')
+    parser.add_argument('--crawl', action='store_true', help='also time a cold and a warm crawl of the corpus')
+    parser.add_argument('--refresh', action='store_true',
+                        help='also time and check refreshing a crawl of the corpus against its server')
+    parser.add_argument('--load', type=int, nargs='*', default=[],
+                        help='number of movies to bulk load into a new database')
+    parser.add_argument('--load-format', choices=['csv', 'parquet', 'arrow'], default=None,
+                        help='load from files of this format instead of from memory')
+    parser.add_argument('--snapshot', type=int, nargs='*', default=[],
+                        help='number of movies to time snapshot analyses on')
+    parser.add_argument('--serve', type=int, nargs='*', default=[],
+                        help='numbers of gunicorn workers to load test the web app with')
+    parser.add_argument('--serve-seconds', type=float, default=10, help='length of each load test')
+    parser.add_argument('--charts', type=int, nargs='*', default=[],
+                        help='numbers of bars to time building the bar charts with')
+    parser.add_argument('--compare', type=int, nargs='*', default=[],
+                        help='number of movies to time the radar chart comparison on')
+    parser.add_argument('--stream', type=int, nargs='*', default=[],
+                        help='number of movies to time streaming the ratings page on')
+    parser.add_argument('--startup', action='store_true', help='time starting the web app until its first request')
+    args = parser.parse_args(argv)
+
+    partial = False if args.full else None
+    for n_titles in (SWEEP_TITLES if args.sweep else []) + args.titles:
+        print(f'Parsing, {n_titles} titles')
+        print_results(bench_parsing(n_titles, args.backend, partial, args.filler, args.sample))
+        if args.crawl:
+            print(f'Crawl, {n_titles} titles')
+            print_results(bench_crawl(n_titles, filler=args.filler))
+        if args.refresh:
+            print(f'Refresh, {n_titles} titles')
+            print_results(bench_refresh(n_titles, filler=args.filler))
+    for n_titles in args.load:
+        print(f'Bulk load, {n_titles} movies' + (f' from {args.load_format}' if args.load_format else ''))
+        print_results(bench_load(n_titles, args.load_format))
+    for n_titles in args.snapshot:
+        print(f'Snapshot analyses, {n_titles} movies')
+        print_results(bench_snapshot(n_titles))
+    for n_points in args.charts:
+        print(f'Bar charts, {n_points} bars')
+        print_results(bench_charts(n_points))
+    for n_titles in args.compare:
+        print(f'Movie comparison, {n_titles} movies')
+        print_results(bench_compare(n_titles))
+    for n_titles in args.stream:
+        print(f'Streamed ratings page, {n_titles} movies')
+        print_results(bench_stream(n_titles))
+    if args.startup:
+        print('Web app startup')
+        print_results(bench_startup())
+    base = None
+    for workers in args.serve:
+        print(f'Serving, {workers} gunicorn workers')
+        results = bench_serve(workers, seconds=args.serve_seconds)
+        base = base or results['requests_per_sec'] / workers
+        results['speedup'] = results['requests_per_sec'] / base
+        print_results(results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+// Typeahead for the movie pickers of the radar chart form. Each .movie_search input fills its
+// datalist from /api/search and stores the id of the picked movie in the hidden input after it.
+// The "Add another movie" button adds pickers up to its data-limit.
+function attachSearch(input) {
+	var list = document.getElementById(input.getAttribute('list'));
+	var hidden = input.nextElementSibling;
+	var ids = {};
+	var timer = null;
+
+	input.addEventListener('input', function () {
+		hidden.value = ids[input.value] || '';
+		clearTimeout(timer);
+		if (hidden.value || input.value.length < 2) {
+			return;
+		}
+		timer = setTimeout(function () {
+			fetch('/api/search?kind=movie&q=' + encodeURIComponent(input.value))
+				.then(function (response) { return response.json(); })
+				.then(function (data) {
+					ids = {};
+					list.innerHTML = '';
+					data.results.forEach(function (movie) {
+						var label = movie.year ? movie.name + ' (' + movie.year + ')' : movie.name;
+						var option = document.createElement('option');
+						option.value = label;
+						list.appendChild(option);
+						ids[label] = movie.id;
+					});
+					if (ids[input.value]) {
+						hidden.value = ids[input.value];
+					}
+				});
+		}, 150);
+	});
+}
+
+document.querySelectorAll('.movie_search').forEach(attachSearch);
+
+var addMovie = document.getElementById('add_movie');
+if (addMovie) {
+	addMovie.addEventListener('click', function () {
+		var slots = document.getElementById('movie_slots');
+		var count = slots.querySelectorAll('.movie_slot').length;
+		var slot = slots.querySelector('.movie_slot:last-child').cloneNode(true);
+		var input = slot.querySelector('.movie_search');
+		var list = slot.querySelector('datalist');
+		list.id = 'movie_matches' + count;
+		list.innerHTML = '';
+		input.setAttribute('list', list.id);
+		input.value = '';
+		slot.querySelector('input[type=hidden]').value = '';
+		slots.appendChild(slot);
+		attachSearch(input);
+		if (count + 1 >= Number(addMovie.dataset.limit)) {
+			addMovie.disabled = true;
+		}
+	});
+}